@@ -0,0 +1,138 @@
+"""
+Set-based appointment changes for the batch endpoints.
+
+Each operation locks the requested rows once, decides per id what happens,
+applies one UPDATE for everything that passed and moves the dashboard
+rollup by the net change per bucket - all inside one transaction.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .exceptions import booking_conflict
+from .models import Appointment, DailyAppointmentStat
+
+# Per-id outcomes returned to the client
+APPLIED = 'ok'
+NOT_FOUND = 'not_found'
+INVALID_TRANSITION = 'invalid_transition'
+CONFLICT = 'conflict'
+
+LOCK_FIELDS = ('id', 'start_time', 'service_id', 'therapist_id', 'location_id', 'status')
+
+
+def _stat_key(row):
+    return (
+        timezone.localtime(row['start_time']).date(),
+        row['service_id'],
+        row['therapist_id'],
+        row['location_id'],
+        row['status'],
+    )
+
+
+def _lock(queryset, ids):
+    return {
+        row['id']: row
+        for row in queryset.filter(pk__in=ids).select_for_update().values(*LOCK_FIELDS)
+    }
+
+
+def transition_appointments(queryset, ids, target):
+    """
+    Moves the given appointments (limited to `queryset`) to status `target`
+    where Appointment.ALLOWED_TRANSITIONS permits it. Returns {id: outcome}.
+    """
+    results = {}
+    with transaction.atomic():
+        rows = _lock(queryset, ids)
+        eligible = []
+        for pk in ids:
+            row = rows.get(pk)
+            if row is None:
+                results[pk] = NOT_FOUND
+            elif target not in Appointment.ALLOWED_TRANSITIONS[row['status']]:
+                results[pk] = INVALID_TRANSITION
+            else:
+                results[pk] = APPLIED
+                eligible.append(row)
+
+        if eligible:
+            Appointment.objects.filter(pk__in=[row['id'] for row in eligible]).update(status=target)
+            DailyAppointmentStat.record_changes(
+                [_stat_key(row) for row in eligible],
+                [_stat_key({**row, 'status': target}) for row in eligible],
+            )
+    return results
+
+
+def reschedule_appointments(queryset, ids, therapist=None, shift_minutes=None):
+    """
+    Reassigns and/or shifts live (pending or confirmed) appointments.
+
+    Tries one UPDATE for the whole set (the booking constraints are checked
+    at the end of the statement, so a contiguous block can shift as one);
+    if that trips a booking constraint the rows are retried one by one in
+    savepoints, so only the clashing ids are reported as conflicts and the
+    rest still move. The retry goes against the shift direction (latest
+    first for a later shift), so each row moves into time its neighbour has
+    already vacated.
+    """
+    shift = timedelta(minutes=shift_minutes or 0)
+    changes = {}
+    if therapist is not None:
+        changes['therapist'] = therapist
+    if shift:
+        changes['start_time'] = F('start_time') + shift
+        changes['end_time'] = F('end_time') + shift
+
+    def moved(row):
+        return {
+            **row,
+            'start_time': row['start_time'] + shift,
+            'therapist_id': therapist.pk if therapist is not None else row['therapist_id'],
+        }
+
+    live = {Appointment.Status.PENDING, Appointment.Status.CONFIRMED}
+    results = {}
+    with transaction.atomic():
+        rows = _lock(queryset, ids)
+        eligible = []
+        for pk in ids:
+            row = rows.get(pk)
+            if row is None:
+                results[pk] = NOT_FOUND
+            elif row['status'] not in live:
+                results[pk] = INVALID_TRANSITION
+            else:
+                eligible.append(row)
+
+        try:
+            with transaction.atomic():
+                Appointment.objects.filter(pk__in=[row['id'] for row in eligible]).update(**changes)
+            applied = eligible
+        except IntegrityError as error:
+            if booking_conflict(error) is None:
+                raise
+            applied = []
+            if shift:
+                eligible.sort(key=lambda row: row['start_time'], reverse=shift > timedelta(0))
+            for row in eligible:
+                try:
+                    with transaction.atomic():
+                        Appointment.objects.filter(pk=row['id']).update(**changes)
+                    applied.append(row)
+                except IntegrityError as row_error:
+                    if booking_conflict(row_error) is None:
+                        raise
+                    results[row['id']] = CONFLICT
+
+        for row in applied:
+            results[row['id']] = APPLIED
+        DailyAppointmentStat.record_changes(
+            [_stat_key(row) for row in applied],
+            [_stat_key(moved(row)) for row in applied],
+        )
+    return {pk: results[pk] for pk in ids}
@@ -0,0 +1,41 @@
+from django.db import IntegrityError, transaction
+
+from .exceptions import BookingConflict, booking_conflict, violated_constraint
+from .models import Appointment
+
+
+def save_booking(serializer, **kwargs):
+    """
+    Saves an appointment serializer, letting the database decide conflicts.
+
+    There is no check-then-insert: each attempt runs in a savepoint and the
+    exclusion constraints reject overlaps atomically, which is safe across
+    concurrent workers. When the appointment has a location, rooms are tried
+    in order (its current room first) until one is accepted.
+    Constraint violations come back as 409 BookingConflict.
+    """
+    instance = serializer.instance
+    location = serializer.validated_data.get('location', getattr(instance, 'location', None))
+
+    if location is None:
+        rooms = [None]
+    else:
+        rooms = list(range(1, max(location.rooms, 1) + 1))
+        current = getattr(instance, 'room', None)
+        if instance is not None and instance.location_id == location.id and current in rooms:
+            rooms.remove(current)
+            rooms.insert(0, current)
+
+    for room in rooms:
+        try:
+            with transaction.atomic():
+                return serializer.save(room=room, **kwargs)
+        except IntegrityError as error:
+            if room is not None and violated_constraint(error) == Appointment.ROOM_OVERLAP_CONSTRAINT:
+                continue  # Taken - try the next room
+            conflict = booking_conflict(error)
+            if conflict is None:
+                raise
+            raise conflict from error
+
+    raise BookingConflict("No room is free at this location for the chosen time.")
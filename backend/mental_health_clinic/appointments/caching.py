@@ -0,0 +1,93 @@
+"""
+Versioned response cache for small, rarely-changing master data
+(services, locations, opening hours).
+
+Each model has a version number in the cache, bumped by the save/delete
+signals in signals.py. Cached responses and ETags embed the version, so a
+bump invalidates everything for that model at once without deleting keys.
+On the steady-state path a request costs one or two cache reads and no
+database queries; a matching If-None-Match gets a 304. There is no
+Last-Modified: a date can't tell apart the per-role variants of one URL
+(and only has 1-second precision), while the ETag covers both.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+# Also bounds staleness when each worker has its own local-memory cache
+CACHE_TIMEOUT = 60 * 5
+
+
+def _version_key(model):
+    return f'master-data:version:{model._meta.label_lower}'
+
+
+def get_version(model):
+    """
+    Current version of a model's data: the millisecond timestamp of its last
+    change. A missing key (first request, eviction) starts a fresh version.
+    """
+    version = cache.get(_version_key(model))
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(_version_key(model), version, CACHE_TIMEOUT):
+            version = cache.get(_version_key(model), version)
+    return version
+
+
+def bump_version(model):
+    previous = cache.get(_version_key(model)) or 0
+    cache.set(_version_key(model), max(int(time.time() * 1000), previous + 1), CACHE_TIMEOUT)
+
+
+class CachedReadMixin:
+    """
+    Serves list/retrieve from the cache with a strong ETag. Writes go through the normal ModelViewSet paths; the model
+    signals take care of invalidation.
+
+    Override get_cache_variant() when the response depends on who is asking.
+    """
+
+    def get_cache_variant(self):
+        return 'all'
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    def _cached(self, render, request, *args, **kwargs):
+        model = self.queryset.model
+        version = get_version(model)
+
+        params = sorted(request.query_params.lists())
+        fingerprint = hashlib.sha1(
+            repr((self.action, self.get_cache_variant(), sorted(kwargs.items()), params)).encode()
+        ).hexdigest()[:16]
+        etag = f'"{version}-{fingerprint}"'
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': 'private, no-cache',  # Always revalidate; 304s are cheap
+            'Vary': 'Authorization',
+        }
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*':
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = f'master-data:response:{model._meta.label_lower}:{version}:{fingerprint}'
+        data = cache.get(key)
+        if data is None:
+            response = render(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, CACHE_TIMEOUT)
+
+        return Response(data, headers=headers)
@@ -0,0 +1,37 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Appointment
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This time is no longer available."
+    default_code = 'booking_conflict'
+
+
+CONFLICT_MESSAGES = {
+    Appointment.THERAPIST_OVERLAP_CONSTRAINT: "The therapist already has an appointment at this time.",
+    Appointment.ROOM_OVERLAP_CONSTRAINT: "No room is free at this location for the chosen time.",
+}
+
+
+def violated_constraint(error):
+    """
+    Name of the constraint behind an IntegrityError, or None.
+    psycopg exposes it on the driver error; fall back to the message text.
+    """
+    diag = getattr(error.__cause__, 'diag', None)
+    name = getattr(diag, 'constraint_name', None)
+    if name:
+        return name
+    message = str(error)
+    return next((known for known in CONFLICT_MESSAGES if known in message), None)
+
+
+def booking_conflict(error):
+    """BookingConflict for a booking constraint violation, else None."""
+    name = violated_constraint(error)
+    if name in CONFLICT_MESSAGES:
+        return BookingConflict(CONFLICT_MESSAGES[name])
+    return None
@@ -0,0 +1,54 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def parse_window_bound(value, param, end_of_day=False):
+    """
+    Parse a ?start= / ?end= value into an aware datetime.
+
+    Accepts either an ISO datetime ('2026-03-01T09:00:00+07:00') or a plain
+    date ('2026-03-01'). Naive values are read in the clinic time zone.
+    A plain date used as an upper bound covers that whole day.
+    """
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+
+    if day is not None:
+        if end_of_day:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+    else:
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({param: "Use an ISO date (YYYY-MM-DD) or datetime."})
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class StartTimeWindowFilter(BaseFilterBackend):
+    """
+    Restricts a queryset to rows whose start_time falls inside
+    [?start=, ?end=), so the calendar only loads the visible range.
+    Either bound may be omitted.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+
+        if start:
+            queryset = queryset.filter(start_time__gte=parse_window_bound(start, 'start'))
+        if end:
+            queryset = queryset.filter(start_time__lt=parse_window_bound(end, 'end', end_of_day=True))
+        return queryset
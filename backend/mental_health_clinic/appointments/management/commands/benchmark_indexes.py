@@ -0,0 +1,180 @@
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User, PatientProfile, TherapistProfile
+from appointments.models import Appointment, Availability, Service
+from communications.models import Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large throwaway dataset and report EXPLAIN ANALYZE timings for the "
+        "appointment, availability and message hot paths, with and without the "
+        "composite indexes. Everything runs in one transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--therapists', type=int, default=50)
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--appointments', type=int, default=200000)
+        parser.add_argument('--messages', type=int, default=200000)
+        parser.add_argument('--days', type=int, default=730, help="Spread appointments over this many days")
+        parser.add_argument('--runs', type=int, default=5, help="EXPLAIN ANALYZE runs per query (median is reported)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("EXPLAIN ANALYZE benchmarking needs the PostgreSQL database.")
+
+        random.seed(42)
+
+        with transaction.atomic():
+            self.stdout.write("Seeding data...")
+            sample = self.seed(options)
+
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            queries = self.build_queries(sample)
+            after = self.measure(queries, options['runs'])
+
+            # Drop the composite indexes inside the transaction (Postgres DDL is
+            # transactional) to get the "before" numbers on the same data.
+            self.drop_indexes()
+            before = self.measure(queries, options['runs'])
+
+            self.report(queries, before, after)
+
+            transaction.set_rollback(True)
+
+    # --- Seeding ---
+    def seed(self, options):
+        now = timezone.now()
+        service = Service.objects.create(name='Benchmark Session', duration_minutes=60)
+
+        therapist_users = User.objects.bulk_create([
+            User(username=f'bench-therapist-{i}', password='!', role='THERAPIST', is_staff=True)
+            for i in range(options['therapists'])
+        ])
+        therapists = TherapistProfile.objects.bulk_create([
+            TherapistProfile(user=u, license_number=f'BENCH-{u.pk}', specialization='CBT')
+            for u in therapist_users
+        ])
+
+        patient_users = User.objects.bulk_create([
+            User(username=f'bench-patient-{i}', password='!', role='PATIENT')
+            for i in range(options['patients'])
+        ], batch_size=1000)
+        patients = PatientProfile.objects.bulk_create([
+            PatientProfile(user=u, date_of_birth=date(1990, 1, 1))
+            for u in patient_users
+        ], batch_size=1000)
+
+        # Distinct (therapist, day, hour) slots, so no therapist is double-booked
+        days, hours = options['days'], range(8, 18)
+        slots = len(therapists) * days * len(hours)
+        if options['appointments'] > slots:
+            raise CommandError(f"--appointments can be at most {slots} (one per therapist per working hour).")
+        first_day = now.replace(minute=0, second=0, microsecond=0) - timedelta(days=days // 2)
+
+        def booking(slot):
+            therapist, rest = divmod(slot, days * len(hours))
+            day, hour = divmod(rest, len(hours))
+            start = first_day.replace(hour=hours[hour]) + timedelta(days=day)
+            return Appointment(
+                patient=random.choice(patients),
+                therapist=therapists[therapist],
+                service=service,
+                start_time=start,
+                end_time=start + timedelta(minutes=service.duration_minutes),
+            )
+
+        Appointment.objects.bulk_create(
+            (booking(slot) for slot in random.sample(range(slots), options['appointments'])),
+            batch_size=5000,
+        )
+
+        today = now.date()
+        Availability.objects.bulk_create((
+            Availability(therapist=t, date=today + timedelta(days=d), start_time=time(h), end_time=time(h + 1))
+            for t in therapists for d in range(-180, 90) for h in (9, 11, 14, 16)
+        ), batch_size=5000, ignore_conflicts=True)
+
+        pairs = [(p.user_id, random.choice(therapists).user_id) for p in patients]
+        directed = (
+            pair if random.random() < 0.5 else pair[::-1]
+            for pair in (random.choice(pairs) for _ in range(options['messages']))
+        )
+        Message.objects.bulk_create((
+            Message(sender_id=sender, receiver_id=receiver, content='benchmark', is_read=random.random() < 0.95)
+            for sender, receiver in directed
+        ), batch_size=5000)
+
+        return {
+            'therapist': therapists[0],
+            'patient': patients[0],
+            'pair': pairs[0],
+            'day': now.date(),
+            'now': now,
+        }
+
+    def build_queries(self, sample):
+        therapist, patient, day, now = sample['therapist'], sample['patient'], sample['day'], sample['now']
+        a, b = sample['pair']
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        next_day_start = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+        return [
+            ("Therapist day view", Appointment.objects.filter(
+                therapist=therapist, start_time__gte=day_start, start_time__lt=next_day_start
+            )),
+            ("Patient appointments", Appointment.objects.filter(patient=patient).order_by('start_time', 'id')),
+            ("Admin calendar window", Appointment.objects.filter(
+                start_time__gte=now, start_time__lt=now + timedelta(days=7)
+            ).order_by('start_time', 'id')[:50]),
+            ("Availability lookup", Availability.objects.filter(
+                therapist__user__id=therapist.user_id, date__gte=day
+            ).order_by('date', 'start_time')),
+            ("Chat thread", Message.objects.filter(
+                Q(sender_id=a, receiver_id=b) | Q(sender_id=b, receiver_id=a)
+            ).order_by('timestamp')),
+            ("Unread from contact", Message.objects.filter(sender_id=b, receiver_id=a, is_read=False)),
+        ]
+
+    # --- Measuring ---
+    def measure(self, queries, runs):
+        timings = {}
+        with connection.cursor() as cursor:
+            for label, queryset in queries:
+                sql, params = queryset.query.sql_with_params()
+                samples = []
+                for _ in range(runs):
+                    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    samples.append(plan[0]['Execution Time'])
+                samples.sort()
+                timings[label] = (samples[len(samples) // 2], plan[0]['Plan']['Node Type'])
+        return timings
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Appointment, Message):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX IF EXISTS "{index.name}"')
+            cursor.execute("ANALYZE")
+
+    def report(self, queries, before, after):
+        self.stdout.write("")
+        self.stdout.write(f"{'Query':<26}{'Without (ms)':>14}{'With (ms)':>12}{'Speed-up':>10}   Plan (with indexes)")
+        for label, _ in queries:
+            slow, _ = before[label]
+            fast, node = after[label]
+            speedup = slow / fast if fast else float('inf')
+            self.stdout.write(f"{label:<26}{slow:>14.2f}{fast:>12.2f}{speedup:>9.1f}x   {node}")
@@ -0,0 +1,123 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from users.models import User, PatientProfile, TherapistProfile
+from appointments.models import Appointment, ClinicalNote, Service
+from appointments.serializers import AppointmentSerializer
+from communications.models import Message
+from communications.serializers import MessageSerializer, message_rows
+from mental_health_clinic.renderers import FastJSONRenderer
+from mental_health_clinic.serializers import shape_queryset, values_plan, values_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway set of appointments and messages and compare rows/second "
+        "for the DRF serializers against the values() fast paths, plus render time "
+        "with the stock JSON renderer and FastJSONRenderer. Timings include the "
+        "query. Everything runs in one transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Appointments and messages to seed")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per path (best is reported)")
+        parser.add_argument('--fields', default='id,start_time,end_time,status,therapist,patient,service_details',
+                            help="?fields= shape used for the sparse and fast appointment paths")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write("Seeding data...")
+            pair = self.seed(options['rows'])
+            self.report(self.build_paths(options['fields'], pair), options['repeat'])
+            transaction.set_rollback(True)
+
+    # --- Seeding ---
+    def seed(self, rows):
+        service = Service.objects.create(name='Benchmark Session', duration_minutes=60)
+        therapist_user = User.objects.create(username='bench-serializer-therapist', password='!', role='THERAPIST',
+                                             first_name='Bench', last_name='Therapist', is_staff=True)
+        therapist = TherapistProfile.objects.create(user=therapist_user, license_number='BENCH-SER', specialization='CBT')
+        patient_user = User.objects.create(username='bench-serializer-patient', password='!', role='PATIENT',
+                                           first_name='Bench', last_name='Patient')
+        patient = PatientProfile.objects.create(user=patient_user, date_of_birth=date(1990, 1, 1))
+
+        # One-hour steps so the therapist's bookings never overlap
+        first = timezone.now() + timedelta(days=1)
+        appointments = Appointment.objects.bulk_create((
+            Appointment(
+                patient=patient, therapist=therapist, service=service,
+                start_time=first + timedelta(hours=i), end_time=first + timedelta(hours=i, minutes=60),
+            )
+            for i in range(rows)
+        ), batch_size=1000)
+        ClinicalNote.objects.bulk_create((
+            ClinicalNote(appointment=a, patient=patient, therapist=therapist,
+                         subjective_analysis='Stable', treatment_plan='Continue')
+            for a in appointments
+        ), batch_size=1000)
+
+        Message.objects.bulk_create((
+            Message(sender=patient_user if i % 2 else therapist_user,
+                    receiver=therapist_user if i % 2 else patient_user,
+                    content=f'benchmark message {i}')
+            for i in range(rows)
+        ), batch_size=1000)
+        return patient_user, therapist_user
+
+    # --- Paths ---
+    def serializer_for(self, query_string):
+        request = Request(APIRequestFactory().get(f'/api/appointments/{query_string}'))
+        return AppointmentSerializer(context={'request': request})
+
+    def build_paths(self, fields, pair):
+        appointments = Appointment.objects.order_by('start_time', 'id')
+        sparse = self.serializer_for(f'?fields={fields}')
+        plan = values_plan(sparse)
+
+        def serialize(query_string):
+            serializer = self.serializer_for(query_string)
+            queryset = shape_queryset(appointments, serializer)
+            return AppointmentSerializer(queryset, many=True, context=serializer.context).data
+
+        thread = Message.objects.filter(sender__in=pair, receiver__in=pair).order_by('id')
+
+        paths = [
+            ("Appointment, full serializer", lambda: serialize('')),
+            ("Appointment, ?fields= serializer", lambda: serialize(f'?fields={fields}')),
+        ]
+        if plan is None:
+            self.stdout.write(self.style.WARNING(f"--fields={fields} needs the serializer; no fast path to compare."))
+        else:
+            paths.append(("Appointment, values() fast path", lambda: values_rows(shape_queryset(appointments, sparse), *plan)))
+        paths += [
+            ("Message, MessageSerializer", lambda: MessageSerializer(thread.select_related('sender', 'receiver'), many=True).data),
+            ("Message, values() fast path", lambda: message_rows(thread)),
+        ]
+        return paths
+
+    # --- Measuring ---
+    def best_of(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def report(self, paths, repeat):
+        self.stdout.write("")
+        self.stdout.write(f"{'Path':<36}{'Rows':>7}{'Rows/s':>11}{'json ms':>10}{'fast ms':>11}")
+        for label, func in paths:
+            seconds, data = self.best_of(repeat, func)
+            stock, _ = self.best_of(repeat, lambda: JSONRenderer().render(data))
+            fast, _ = self.best_of(repeat, lambda: FastJSONRenderer().render(data))
+            rate = len(data) / seconds if seconds else float('inf')
+            self.stdout.write(f"{label:<36}{len(data):>7}{rate:>11.0f}{stock * 1000:>10.1f}{fast * 1000:>11.1f}")
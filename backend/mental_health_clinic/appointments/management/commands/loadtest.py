@@ -0,0 +1,79 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a running server with concurrent GETs and report throughput and "
+        "latency per concurrency level. Start the server with different "
+        "WEB_CONCURRENCY values (e.g. 1, 2, 4) and compare the req/s columns to "
+        "see how the API scales with gunicorn workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api/services/')
+        parser.add_argument('--concurrency', default='1,4,16,64',
+                            help="Comma-separated client thread counts to try")
+        parser.add_argument('--duration', type=float, default=15, help="Seconds per concurrency level")
+        parser.add_argument('--token', help="JWT access token, sent as a Bearer header")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency takes comma-separated integers, e.g. 1,4,16")
+
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+        try:
+            requests.get(options['url'], headers=headers, timeout=5)
+        except requests.RequestException as error:
+            raise CommandError(f"Server not reachable: {error}")
+
+        self.stdout.write(f"Target: {options['url']}")
+        self.stdout.write(f"{'Clients':>8}{'Requests':>10}{'Errors':>8}{'Req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for clients in levels:
+            latencies, errors, elapsed = self.run_level(options['url'], headers, clients, options['duration'])
+            self.report(clients, latencies, errors, elapsed)
+
+    def run_level(self, url, headers, clients, duration):
+        deadline = time.perf_counter() + duration
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+
+        def client():
+            nonlocal errors
+            session = requests.Session()  # Keep-alive, like a browser
+            mine, failed = [], 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    ok = session.get(url, headers=headers, timeout=30).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                mine.append(time.perf_counter() - started)
+                failed += not ok
+            with lock:
+                latencies.extend(mine)
+                errors += failed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            for _ in range(clients):
+                pool.submit(client)
+        return latencies, errors, time.perf_counter() - started
+
+    def report(self, clients, latencies, errors, elapsed):
+        if not latencies:
+            self.stdout.write(f"{clients:>8}{0:>10}")
+            return
+        cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{clients:>8}{len(latencies):>10}{errors:>8}{len(latencies) / elapsed:>10.1f}"
+            f"{cuts[49] * 1000:>9.1f}{cuts[94] * 1000:>9.1f}{cuts[98] * 1000:>9.1f}"
+        )
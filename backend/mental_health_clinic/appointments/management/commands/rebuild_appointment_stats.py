@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from appointments.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyAppointmentStat rollup from the Appointment table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild days from this date (YYYY-MM-DD) onwards")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+
+        written = rebuild_daily_stats(since=since, batch_size=options['batch_size'])
+        scope = f"from {since}" if since else "for all dates"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily stat rows {scope}."))
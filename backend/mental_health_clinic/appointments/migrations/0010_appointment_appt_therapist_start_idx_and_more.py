@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_appointment_location'),
+        ('users', '0007_therapistprofile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['therapist', 'start_time'], name='appt_therapist_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'start_time'], name='appt_patient_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start_time', 'id'], name='appt_start_id_idx'),
+        ),
+    ]
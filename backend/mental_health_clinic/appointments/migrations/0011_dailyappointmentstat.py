@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_stats(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    DailyAppointmentStat = apps.get_model('appointments', 'DailyAppointmentStat')
+
+    grouped = (
+        Appointment.objects
+        .annotate(day=TruncDate('start_time', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'service_id', 'therapist_id', 'location_id', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    DailyAppointmentStat.objects.bulk_create([
+        DailyAppointmentStat(
+            date=row['day'],
+            service_id=row['service_id'],
+            therapist_id=row['therapist_id'],
+            location_id=row['location_id'],
+            status=row['status'],
+            count=row['total'],
+        )
+        for row in grouped
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_appointment_appt_therapist_start_idx_and_more'),
+        ('users', '0007_therapistprofile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAppointmentStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('location', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='appointments.location')),
+                ('service', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='appointments.service')),
+                ('therapist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.therapistprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'service', 'therapist', 'location', 'status'), name='daily_stat_unique_key', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
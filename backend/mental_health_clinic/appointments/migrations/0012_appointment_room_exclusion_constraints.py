@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 15:30
+
+import appointments.models
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+def check_existing_overlaps(apps, schema_editor):
+    # Fail with a readable list instead of Postgres' generic constraint error
+    # when old data already double-books a therapist.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT a.id, b.id FROM appointments_appointment a
+            JOIN appointments_appointment b
+              ON a.therapist_id = b.therapist_id AND a.id < b.id
+             AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time)
+            WHERE a.status <> 'CANCELLED' AND b.status <> 'CANCELLED'
+            LIMIT 20
+            """
+        )
+        clashes = cursor.fetchall()
+    if clashes:
+        pairs = ', '.join(f'{a}/{b}' for a, b in clashes)
+        raise RuntimeError(
+            f"Overlapping appointments must be cancelled or moved before this migration (ids: {pairs})."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0011_dailyappointmentstat'),
+        ('users', '0007_therapistprofile_date_of_birth'),
+    ]
+
+    operations = [
+        # GiST needs btree_gist for the plain equality columns
+        BtreeGistExtension(),
+        migrations.RunPython(check_existing_overlaps, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='appointment',
+            name='room',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status', 'CANCELLED'), _negated=True), expressions=[('therapist', '='), (appointments.models.TsTzRange('start_time', 'end_time'), '&&')], name='appt_no_therapist_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status', 'CANCELLED'), _negated=True), expressions=[('location', '='), ('room', '='), (appointments.models.TsTzRange('start_time', 'end_time'), '&&')], name='appt_no_room_overlap'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 18:05
+
+import appointments.models
+import django.contrib.postgres.constraints
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0012_appointment_room_exclusion_constraints'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='appt_no_therapist_overlap',
+        ),
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='appt_no_room_overlap',
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status', 'CANCELLED'), _negated=True), deferrable=models.Deferrable['IMMEDIATE'], expressions=[('therapist', '='), (appointments.models.TsTzRange('start_time', 'end_time'), '&&')], name='appt_no_therapist_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status', 'CANCELLED'), _negated=True), deferrable=models.Deferrable['IMMEDIATE'], expressions=[('location', '='), ('room', '='), (appointments.models.TsTzRange('start_time', 'end_time'), '&&')], name='appt_no_room_overlap'),
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+from collections import Counter
+
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db import models, transaction, IntegrityError
+from django.db.models import Deferrable, F, Func, Q
+from django.utils import timezone
 #Import the profiles from users
 from users.models import PatientProfile, TherapistProfile
 
@@ -33,6 +39,12 @@ class Location(models.Model):
         return f"{self.name} ({'Open' if self.is_active else 'Closed'})"
 
 
+class TsTzRange(Func):
+    """tstzrange(start, end) - a half-open [start, end) timestamp range."""
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
 # --- Appointment ---
 class Appointment(models.Model):
     class Status(models.TextChoices):
@@ -54,13 +66,101 @@ class Appointment(models.Model):
     notes = models.TextField(blank=True, help_text="Patient requests or Doctor notes")
     created_at = models.DateTimeField(auto_now_add=True)
     location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True)
+    # 1..location.rooms, picked at booking time (see appointments/booking.py)
+    room = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    # Names of the booking constraints, used to map violations to 409 responses
+    THERAPIST_OVERLAP_CONSTRAINT = 'appt_no_therapist_overlap'
+    ROOM_OVERLAP_CONSTRAINT = 'appt_no_room_overlap'
+
+    class Meta:
+        constraints = [
+            # A therapist can't be in two live appointments at once. Enforced by
+            # Postgres, so concurrent bookings can't both slip past a Python check.
+            # DEFERRABLE (initially immediate) moves the check to the end of each
+            # statement, so one UPDATE can shift back-to-back bookings together.
+            ExclusionConstraint(
+                name='appt_no_therapist_overlap',
+                expressions=[
+                    ('therapist', RangeOperators.EQUAL),
+                    (TsTzRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+                ],
+                condition=~Q(status='CANCELLED'),
+                deferrable=Deferrable.IMMEDIATE,
+            ),
+            # Same for a room at a location. Rows without a room never conflict.
+            ExclusionConstraint(
+                name='appt_no_room_overlap',
+                expressions=[
+                    ('location', RangeOperators.EQUAL),
+                    ('room', RangeOperators.EQUAL),
+                    (TsTzRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+                ],
+                condition=~Q(status='CANCELLED'),
+                deferrable=Deferrable.IMMEDIATE,
+            ),
+        ]
+        indexes = [
+            # Therapist calendar / day lookups: filter(therapist=..., start_time__gte=day_start,
+            # start_time__lt=next_day_start) with aware bounds. A start_time__date lookup
+            # casts the column to a local date, which this index can't serve.
+            models.Index(fields=['therapist', 'start_time'], name='appt_therapist_start_idx'),
+            # Patient dashboard: filter(patient=...) ordered by start_time
+            models.Index(fields=['patient', 'start_time'], name='appt_patient_start_idx'),
+            # Admin calendar windows and keyset pagination on (start_time, id)
+            models.Index(fields=['start_time', 'id'], name='appt_start_id_idx'),
+        ]
+
+    # Status changes staff may apply; COMPLETED and CANCELLED are final
+    ALLOWED_TRANSITIONS = {
+        Status.PENDING: {Status.CONFIRMED, Status.CANCELLED},
+        Status.CONFIRMED: {Status.COMPLETED, Status.CANCELLED},
+        Status.COMPLETED: set(),
+        Status.CANCELLED: set(),
+    }
+
+    # Fields that decide which DailyAppointmentStat bucket a row counts towards
+    STAT_KEY_FIELDS = ('start_time', 'service_id', 'therapist_id', 'location_id', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rollup bucket as loaded, so save() can move the count
+        # without re-reading the row. Skipped when fields were deferred.
+        if set(cls.STAT_KEY_FIELDS).issubset(field_names):
+            instance._loaded_stat_key = instance.stat_key()
+        return instance
+
+    def stat_key(self):
+        return (
+            timezone.localtime(self.start_time).date(),
+            self.service_id,
+            self.therapist_id,
+            self.location_id,
+            self.status,
+        )
+
+    def _previous_stat_key(self):
+        if self._state.adding:
+            return None
+        if hasattr(self, '_loaded_stat_key'):
+            return self._loaded_stat_key
+        previous = Appointment.objects.filter(pk=self.pk).only(*self.STAT_KEY_FIELDS).first()
+        return previous.stat_key() if previous else None
 
     def save(self, *args, **kwargs):
         # Auto-calculate end_time based on the Service duration
         if self.service and self.start_time:
             from datetime import timedelta
             self.end_time = self.start_time + timedelta(minutes=self.service.duration_minutes)
-        super().save(*args, **kwargs)
+
+        previous_key = self._previous_stat_key()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            new_key = self.stat_key()
+            if new_key != previous_key:
+                DailyAppointmentStat.record_change(previous_key, new_key)
+        self._loaded_stat_key = new_key
 
     def __str__(self):
         return f"{self.patient} with {self.therapist} on {self.start_time.strftime('%Y-%m-%d %H:%M')}"
@@ -112,4 +212,114 @@ class ClinicOperatingHour(models.Model):
     end_time = models.TimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"{self.day_of_week}: {'Open' if self.is_open else 'Closed'}"
\ No newline at end of file
+        return f"{self.day_of_week}: {'Open' if self.is_open else 'Closed'}"
+
+# --- Reporting rollup ---
+class DailyAppointmentStat(models.Model):
+    """
+    Pre-aggregated appointment counts per clinic-local day and
+    (service, therapist, location, status).
+
+    Kept current by Appointment.save(), the delete signals (see detach() for
+    deleted services and locations) and the batch endpoints (via
+    record_changes), so dashboards read O(days) rows instead
+    of scanning every appointment. Other bulk UPDATEs bypass all of these;
+    rebuild with `python manage.py rebuild_appointment_stats` if it drifts.
+    """
+    KEY_FIELDS = ('date', 'service_id', 'therapist_id', 'location_id', 'status')
+
+    date = models.DateField()
+    # SET_NULL like Appointment.service/location; see detach() for merging the buckets
+    service = models.ForeignKey(Service, on_delete=models.SET_NULL, null=True, related_name='+')
+    therapist = models.ForeignKey(TherapistProfile, on_delete=models.CASCADE, related_name='+')
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Appointment.Status.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # NULL service/location are real buckets, so they must collide too.
+            # Leading on date, this also serves the dashboard's date-range scan.
+            models.UniqueConstraint(
+                fields=['date', 'service', 'therapist', 'location', 'status'],
+                name='daily_stat_unique_key',
+                nulls_distinct=False,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
+
+    @classmethod
+    def record_change(cls, old_key=None, new_key=None):
+        """
+        Moves one appointment from the old bucket to the new one.
+        Either key may be None (create / delete).
+        """
+        if old_key is not None:
+            cls.bump(old_key, -1)
+        if new_key is not None:
+            cls.bump(new_key, 1)
+
+    @classmethod
+    def record_changes(cls, old_keys, new_keys):
+        """
+        Batch form of record_change: nets the moves out per bucket first, so
+        a set-based UPDATE of N rows costs one bump per distinct bucket.
+        """
+        deltas = Counter(new_keys)
+        deltas.subtract(Counter(old_keys))
+        for key, delta in deltas.items():
+            if delta:
+                cls.bump(key, delta)
+
+    @classmethod
+    def detach(cls, field, pk):
+        """
+        Moves every bucket of a Service or Location that is being deleted
+        (`field` is 'service_id' or 'location_id') into the matching NULL
+        bucket, as SET_NULL does to its appointments. Rows that collide with
+        an existing NULL bucket are merged, so the unique key holds and no
+        counts are lost. A fixed number of queries.
+        """
+        with transaction.atomic():
+            detached = list(cls.objects.filter(**{field: pk}).select_for_update().values('id', *cls.KEY_FIELDS, 'count'))
+            if not detached:
+                return
+
+            totals = Counter()
+            for row in detached:
+                totals[tuple(None if name == field else row[name] for name in cls.KEY_FIELDS)] += row['count']
+
+            dates = [row['date'] for row in detached]
+            merged = [
+                row for row in cls.objects.filter(
+                    **{f'{field}__isnull': True}, date__gte=min(dates), date__lte=max(dates)
+                ).select_for_update().values('id', *cls.KEY_FIELDS, 'count')
+                if tuple(row[name] for name in cls.KEY_FIELDS) in totals
+            ]
+            for row in merged:
+                totals[tuple(row[name] for name in cls.KEY_FIELDS)] += row['count']
+
+            cls.objects.filter(pk__in=[row['id'] for row in detached + merged]).delete()
+            cls.objects.bulk_create(
+                cls(count=count, **dict(zip(cls.KEY_FIELDS, key))) for key, count in totals.items()
+            )
+
+    @classmethod
+    def bump(cls, key, delta):
+        lookup = dict(zip(cls.KEY_FIELDS, key))
+
+        # F() keeps concurrent bookings from overwriting each other's counts
+        if cls.objects.filter(**lookup).update(count=F('count') + delta):
+            return
+        if delta < 0:
+            # Nothing to decrement: the bucket predates the rollup
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Another request created the bucket first
+            cls.objects.filter(**lookup).update(count=F('count') + delta)
@@ -0,0 +1,162 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class AppointmentCursorPagination(BasePagination):
+    """
+    Keyset pagination over (start_time, id).
+
+    Each page is a single indexed range scan: the cursor stores the
+    (start_time, id) of the boundary row, so deep pages cost the same
+    as the first one (no OFFSET).
+
+    Pagination is opt-in: it only kicks in when the client sends
+    ?page_size= (or follows a cursor link), so existing callers that expect
+    a plain list keep working. A plain list without a ?start=/?end= window
+    stops after max_unwindowed_rows, with a Link: rel="next" cursor header
+    for the rest.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    window_query_params = ('start', 'end')
+    max_page_size = 200
+    default_page_size = 50
+    max_unwindowed_rows = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw is None:
+            # Following a cursor link without an explicit size still paginates
+            if self.cursor_query_param in request.query_params:
+                return self.default_page_size
+            return None
+        try:
+            size = int(raw)
+        except ValueError:
+            return self.default_page_size
+        if size <= 0:
+            return self.default_page_size
+        return min(size, self.max_page_size)
+
+    def get_row_cap(self, request):
+        """Row limit for a plain list, or None when a window already bounds it."""
+        if any(request.query_params.get(param) for param in self.window_query_params):
+            return None
+        return self.max_unwindowed_rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        if not self.page_size:
+            return self.cap_queryset(queryset, request)
+
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = cursor
+
+        if reverse:
+            queryset = queryset.order_by('-start_time', '-id')
+            if position is not None:
+                start_time, pk = position
+                queryset = queryset.filter(Q(start_time__lt=start_time) | Q(start_time=start_time, id__lt=pk))
+        else:
+            queryset = queryset.order_by('start_time', 'id')
+            if position is not None:
+                start_time, pk = position
+                queryset = queryset.filter(Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=pk))
+
+        # Fetch one extra row to know whether another page exists
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        page = results[:self.page_size]
+
+        if reverse:
+            page.reverse()
+            self.has_previous = has_more
+            self.has_next = position is not None
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = page
+        return page
+
+    def cap_queryset(self, queryset, request):
+        cap = self.get_row_cap(request)
+        if cap is None:
+            return None
+
+        results = list(queryset.order_by('start_time', 'id')[:cap + 1])
+        self.has_next = len(results) > cap
+        self.page = results[:cap]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor(False, last.start_time, last.pk)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        first = self.page[0]
+        return self.encode_cursor(True, first.start_time, first.pk)
+
+    def get_paginated_response(self, data):
+        if not self.page_size:
+            # A capped plain list keeps its shape; the cursor goes in a header
+            response = Response(data)
+            next_link = self.get_next_link()
+            if next_link:
+                response['Link'] = f'<{next_link}>; rel="next"'
+            return response
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            direction, raw_start, raw_pk = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            start_time = parse_datetime(raw_start)
+            pk = int(raw_pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if start_time is None or direction not in ('n', 'p'):
+            raise NotFound(self.invalid_cursor_message)
+
+        return direction == 'p', (start_time, pk)
+
+    def encode_cursor(self, reverse, start_time, pk):
+        raw = f"{'p' if reverse else 'n'}|{start_time.isoformat()}|{pk}"
+        encoded = b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from users.roles import resolve_role
+
 class IsOwnerOrTherapist(permissions.BasePermission):
     """
     Custom permission to only allow:
@@ -14,16 +16,18 @@ class IsOwnerOrTherapist(permissions.BasePermission):
 
         # This part handles specific object access (e.g., /appointments/1/)
 
+        role = resolve_role(request)
+
         # 1. Superusers can do anything
-        if request.user.is_superuser:
+        if role.is_admin:
             return True
 
         # 2. If user is the Patient linked to the appointment
-        if hasattr(request.user, 'patient_profile') and obj.patient == request.user.patient_profile:
+        if role.is_patient and obj.patient_id == role.patient_id:
             return True
 
         # 3. If user is the Therapist linked to the appointment
-        if hasattr(request.user, 'therapist_profile') and obj.therapist == request.user.therapist_profile:
+        if role.is_therapist and obj.therapist_id == role.therapist_id:
             return True
 
         return False
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""
+Slot-finding engine.
+
+Works on half-open [start, end) datetime intervals. Every helper expects
+(or produces) lists sorted by start, so the whole search is one sort per
+therapist followed by linear sweeps: O(n log n) in the number of
+availability rows and bookings in the requested range.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, DateTimeField, Exists, F, Func, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, TruncTime
+from django.utils import timezone
+
+from users.models import TherapistProfile
+from .models import Appointment, Availability, ClinicOperatingHour
+
+
+def merge_intervals(intervals):
+    """Sorts and merges overlapping or touching intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(free, busy):
+    """Removes the `busy` intervals from `free` (both merged and sorted)."""
+    result = []
+    i = 0
+    for start, end in free:
+        cursor = start
+        # Skip busy blocks that finish before this free block starts
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                result.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+
+def intersect_intervals(first, second):
+    """Overlap of two merged, sorted interval lists."""
+    result = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def saturated_intervals(intervals, capacity):
+    """
+    Sweep line over bookings: returns the periods where at least `capacity`
+    of them overlap (e.g. every room at a location is taken).
+    """
+    events = []
+    for start, end in intervals:
+        if start < end:
+            events.append((start, 1))
+            events.append((end, -1))
+    # Ends sort before starts at the same instant, so back-to-back bookings don't stack
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    result = []
+    active = 0
+    full_since = None
+    for moment, change in events:
+        active += change
+        if active >= capacity and full_since is None:
+            full_since = moment
+        elif active < capacity and full_since is not None:
+            if full_since < moment:
+                result.append((full_since, moment))
+            full_since = None
+    return merge_intervals(result)
+
+
+def split_into_slots(free, duration, step=None):
+    """Cuts free intervals into bookable [start, start + duration) slots."""
+    step = step or duration
+    slots = []
+    for start, end in free:
+        cursor = start
+        while cursor + duration <= end:
+            slots.append((cursor, cursor + duration))
+            cursor += step
+    return slots
+
+
+def _aware(day, clock):
+    return timezone.make_aware(datetime.combine(day, clock))
+
+
+def _opening_intervals(first_day, last_day):
+    """Clinic opening hours per day in the range, from ClinicOperatingHour."""
+    hours = {row.day_of_week: row for row in ClinicOperatingHour.objects.all()}
+    intervals = []
+    day = first_day
+    while day <= last_day:
+        row = hours.get(day.strftime('%A'))
+        if row is None:
+            # No configuration for this weekday: don't clamp
+            intervals.append((_aware(day, datetime.min.time()), _aware(day + timedelta(days=1), datetime.min.time())))
+        elif row.is_open and row.start_time and row.end_time:
+            intervals.append((_aware(day, row.start_time), _aware(day, row.end_time)))
+        day += timedelta(days=1)
+    return intervals
+
+
+def find_open_slots(first_day, last_day, duration, therapist_user_id=None, location=None, step=None):
+    """
+    Bookable slots per therapist between first_day and last_day (inclusive).
+
+    A slot must lie inside the therapist's Availability, inside the clinic's
+    operating hours, must not overlap the therapist's non-cancelled
+    appointments and, when a location is given, must not fall where all of
+    its rooms are already booked. Uses a fixed number of queries.
+    """
+    if location is not None and not location.is_active:
+        return []  # Closed for maintenance
+
+    range_start = _aware(first_day, datetime.min.time())
+    range_end = _aware(last_day + timedelta(days=1), datetime.min.time())
+    now = timezone.now()
+
+    therapists = TherapistProfile.objects.filter(status='Active')
+    if therapist_user_id is not None:
+        therapists = therapists.filter(user_id=therapist_user_id)
+    therapist_users = dict(therapists.values_list('id', 'user_id'))
+
+    windows = defaultdict(list)
+    for row in Availability.objects.filter(
+        therapist_id__in=therapist_users, date__gte=first_day, date__lte=last_day
+    ).values('therapist_id', 'date', 'start_time', 'end_time'):
+        windows[row['therapist_id']].append((_aware(row['date'], row['start_time']), _aware(row['date'], row['end_time'])))
+
+    active = Appointment.objects.exclude(status=Appointment.Status.CANCELLED).filter(
+        start_time__lt=range_end, end_time__gt=range_start
+    )
+    booked = defaultdict(list)
+    for therapist_id, start, end in active.filter(therapist_id__in=windows).values_list('therapist_id', 'start_time', 'end_time'):
+        booked[therapist_id].append((start, end))
+
+    blocked = [(range_start, max(now, range_start))]  # Nothing in the past
+    if location is not None:
+        location_bookings = active.filter(location=location).values_list('start_time', 'end_time')
+        blocked += saturated_intervals(list(location_bookings), max(location.rooms, 1))
+    blocked = merge_intervals(blocked)
+
+    opening = merge_intervals(_opening_intervals(first_day, last_day))
+
+    results = []
+    for therapist_id in sorted(windows):
+        free = intersect_intervals(merge_intervals(windows[therapist_id]), opening)
+        free = subtract_intervals(free, merge_intervals(booked[therapist_id]))
+        free = subtract_intervals(free, blocked)
+        slots = split_into_slots(free, duration, step)
+        if slots:
+            results.append({
+                'therapist': therapist_id,
+                'therapist_user_id': therapist_users[therapist_id],
+                'slots': [{'start': start, 'end': end} for start, end in slots],
+            })
+    return results
+
+
+class LocalDateTime(Func):
+    """(date + time) AT TIME ZONE <current zone> - a wall-clock moment as an aware timestamp."""
+    arg_joiner = ' + '
+    output_field = DateTimeField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, template='(%(expressions)s)', **extra_context)
+        return f'({sql} AT TIME ZONE %s)', (*params, timezone.get_current_timezone_name())
+
+
+def annotate_next_available(therapists):
+    """
+    Adds next_available_date / next_available_time to a TherapistProfile
+    queryset: the earliest future moment inside one of the therapist's
+    Availability windows that no active appointment covers - the same
+    subtraction find_open_slots does, minus opening hours and slot length.
+
+    Within a window that moment is either its start (or now, for a window
+    already under way) or the end of a booking inside it, whichever comes
+    first without another booking covering it. One correlated subquery per
+    row instead of a request per therapist; the booking lookups compare
+    start_time with the window's aware [local midnight, end) bounds, so each
+    stays a range scan on the (therapist, start_time) index.
+    """
+    now = timezone.localtime()
+    today, now_time = now.date(), now.time().replace(second=0, microsecond=0)
+    active = Appointment.objects.exclude(status=Appointment.Status.CANCELLED)
+
+    def at(field):
+        # The outer window's date + one of its times
+        return LocalDateTime(OuterRef('date'), OuterRef(field))
+
+    same_day = active.filter(
+        therapist_id=OuterRef('therapist_id'),
+        start_time__gte=LocalDateTime(OuterRef('date'), Value(time.min)),
+    )
+
+    # Bookings that end inside the window, at a moment no other booking covers
+    covered_end = active.filter(
+        therapist_id=OuterRef('therapist_id'),
+        start_time__gte=LocalDateTime(OuterRef(OuterRef('date')), Value(time.min)),
+        start_time__lte=OuterRef('end_time'),
+        end_time__gt=OuterRef('end_time'),
+    )
+    free_after_booking = (
+        same_day.filter(
+            start_time__lt=at('end_time'),
+            end_time__gte=at('free_from'),
+            end_time__lt=at('end_time'),
+        )
+        .exclude(Exists(covered_end))
+        .order_by('end_time')
+        .values(end=TruncTime('end_time'))[:1]
+    )
+    start_covered = same_day.filter(
+        start_time__lte=at('free_from'),
+        end_time__gt=at('free_from'),
+    )
+
+    open_windows = (
+        Availability.objects.filter(therapist_id=OuterRef('pk'))
+        .filter(Q(date__gt=today) | Q(date=today, end_time__gt=now_time))
+        .annotate(free_from=Case(
+            When(date=today, start_time__lt=now_time, then=Value(now_time)),
+            default=F('start_time'),
+        ))
+        .annotate(first_free=Coalesce(
+            Case(When(~Exists(start_covered), then=F('free_from'))),
+            Subquery(free_after_booking),
+        ))
+        .filter(first_free__isnull=False)
+        .order_by('date', 'first_free')
+    )
+    return therapists.annotate(
+        next_available_date=Subquery(open_windows.values('date')[:1]),
+        next_available_time=Subquery(open_windows.values('first_free')[:1]),
+    )
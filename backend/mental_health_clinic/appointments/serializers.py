@@ -1,7 +1,11 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Service, Appointment
 from users.serializers import PatientProfileSerializer, TherapistProfileSerializer
-from users.models import PatientProfile
+from users.models import PatientProfile, TherapistProfile
+from mental_health_clinic.serializers import DynamicFieldsMixin
 from .models import ClinicalNote
 from .models import Availability
 from .models import Location
@@ -18,7 +22,7 @@ class ClinicalNoteSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['therapist', 'created_at']
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     therapist_details = TherapistProfileSerializer(source='therapist', read_only=True)
     patient_details = PatientProfileSerializer(source='patient', read_only=True)
@@ -29,11 +33,13 @@ class AppointmentSerializer(serializers.ModelSerializer):
         model = Appointment
         fields = [
             'id', 'patient', 'therapist', 'service',
-            'start_time', 'end_time', 'status', 'notes',
+            'start_time', 'end_time', 'status', 'notes', 'location', 'room',
             'therapist_details', 'patient_details', 'service_details',
             'clinical_note'
         ]
-        read_only_fields = ['patient', 'status', 'end_time']
+        read_only_fields = ['patient', 'status', 'end_time', 'room']
+        # Nested objects a client can leave out with ?expand= (or ?fields=)
+        expandable_fields = ['therapist_details', 'patient_details', 'service_details', 'clinical_note']
 
     def validate_service(self, value):
         """
@@ -45,6 +51,30 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
         return value
 
+class BatchIdsSerializer(serializers.Serializer):
+    MAX_IDS = 500
+
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=MAX_IDS)
+
+    def validate_ids(self, value):
+        # Drop repeats but keep the caller's order for the result map
+        return list(dict.fromkeys(value))
+
+class BatchStatusSerializer(BatchIdsSerializer):
+    status = serializers.ChoiceField(choices=Appointment.Status.choices)
+
+class BatchRescheduleSerializer(BatchIdsSerializer):
+    # Only therapists who can see the appointments (On Leave also deactivates the user)
+    therapist = serializers.PrimaryKeyRelatedField(
+        queryset=TherapistProfile.objects.filter(status='Active', user__is_active=True), required=False,
+    )
+    shift_minutes = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data.get('therapist') is None and not data.get('shift_minutes'):
+            raise serializers.ValidationError("Give a therapist, a non-zero shift_minutes, or both.")
+        return data
+
 class PatientSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     full_name = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -59,6 +89,73 @@ class AvailabilitySerializer(serializers.ModelSerializer):
         fields = ['id', 'therapist', 'date', 'start_time', 'end_time']
         read_only_fields = ['therapist']
 
+class WeeklyBlockSerializer(serializers.Serializer):
+    day_of_week = serializers.ChoiceField(choices=ClinicOperatingHour.DAY_CHOICES)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, data):
+        if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError("end_time must be after start_time.")
+        return data
+
+class RecurringAvailabilitySerializer(serializers.Serializer):
+    """
+    A weekly pattern repeated between two dates, minus any exception dates
+    (holidays, leave). Expands to one Availability row per block per day.
+    """
+    MAX_DAYS = 366
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    weekly = WeeklyBlockSerializer(many=True, allow_empty=False)
+    exceptions = serializers.ListField(child=serializers.DateField(), required=False, default=list)
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({"end_date": "Must be on or after start_date."})
+        if (data['end_date'] - data['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"end_date": f"A schedule can cover at most {self.MAX_DAYS} days."})
+        return data
+
+    def expand(self, therapist):
+        """Unsaved Availability rows for every matching day in the range."""
+        data = self.validated_data
+        skipped = set(data['exceptions'])
+        by_day = {}
+        for block in data['weekly']:
+            by_day.setdefault(block['day_of_week'], []).append(block)
+
+        day = data['start_date']
+        while day <= data['end_date']:
+            if day not in skipped:
+                for block in by_day.get(day.strftime('%A'), []):
+                    yield Availability(
+                        therapist=therapist, date=day,
+                        start_time=block['start_time'], end_time=block['end_time'],
+                    )
+            day += timedelta(days=1)
+
+class SlotSearchSerializer(serializers.Serializer):
+    """Query params of /api/availability/slots/. Blank params count as absent."""
+    MAX_RANGE_DAYS = 31
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.all(), required=False)
+    location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.all(), required=False)
+    therapist_id = serializers.IntegerField(min_value=1, required=False)
+    step = serializers.IntegerField(min_value=1, required=False, help_text="Minutes between slot starts")
+
+    def validate(self, data):
+        data.setdefault('start', timezone.localdate())
+        data.setdefault('end', data['start'] + timedelta(days=6))
+        if data['end'] < data['start']:
+            raise serializers.ValidationError({"end": "Must be on or after start."})
+        if (data['end'] - data['start']).days >= self.MAX_RANGE_DAYS:
+            raise serializers.ValidationError({"end": f"Search at most {self.MAX_RANGE_DAYS} days at a time."})
+        return data
+
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .caching import bump_version
+from .models import Appointment, ClinicOperatingHour, DailyAppointmentStat, Location, Service
+
+
+@receiver(post_delete, sender=Appointment)
+def remove_deleted_appointment_from_rollup(sender, instance, **kwargs):
+    # Fires for cascades too (e.g. a deleted patient account)
+    DailyAppointmentStat.record_change(old_key=instance.stat_key())
+
+
+@receiver(pre_delete, sender=Service)
+def detach_deleted_service_from_rollup(sender, instance, **kwargs):
+    # Its appointments keep counting, under "no service"
+    DailyAppointmentStat.detach('service_id', instance.pk)
+
+
+@receiver(pre_delete, sender=Location)
+def detach_deleted_location_from_rollup(sender, instance, **kwargs):
+    DailyAppointmentStat.detach('location_id', instance.pk)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=ClinicOperatingHour)
+@receiver(post_delete, sender=ClinicOperatingHour)
+def invalidate_master_data_cache(sender, **kwargs):
+    # Queryset .update() doesn't send signals; bump_version() by hand after one
+    bump_version(sender)
@@ -0,0 +1,113 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Appointment, DailyAppointmentStat
+
+# Window lengths (in days) the admin dashboard can ask for
+DASHBOARD_WINDOWS = (7, 30, 90)
+
+
+def dashboard_window(days):
+    """
+    Returns (first_day, last_day) for a window ending today, in the clinic time zone.
+    """
+    today = timezone.localdate()
+    return today - timedelta(days=days - 1), today
+
+
+def build_dashboard_stats(days=7):
+    """
+    Computes every admin dashboard breakdown from ONE grouped query.
+
+    Reads the DailyAppointmentStat rollup (already bucketed by clinic-local
+    day), so the cost grows with the window length, not with appointment
+    history. The per-dimension totals are folded together in Python from
+    the few grouped rows.
+    """
+    first_day, last_day = dashboard_window(days)
+
+    rows = (
+        DailyAppointmentStat.objects
+        .filter(date__gte=first_day, date__lte=last_day)
+        .values('date', 'status', 'location__name', 'service__name')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+
+    per_day = Counter()
+    per_status = Counter({status: 0 for status in Appointment.Status.values})
+    per_location = Counter()
+    per_service = Counter()
+
+    for row in rows:
+        count = row['total']
+        per_day[row['date']] += count
+        per_status[row['status']] += count
+        per_location[row['location__name'] or 'Unassigned'] += count
+        if row['service__name']:  # Ignore nulls
+            per_service[row['service__name']] += count
+
+    # Keep the familiar 'Mon'..'Sun' labels for the weekly chart; longer
+    # windows would repeat day names, so they are keyed by ISO date instead.
+    daily_counts = {}
+    for i in range(days):
+        day = first_day + timedelta(days=i)
+        label = day.strftime("%a") if days == 7 else day.isoformat()
+        daily_counts[label] = per_day[day]
+
+    return {
+        "window_days": days,
+        "start_date": first_day,
+        "end_date": last_day,
+        "total_appointments": sum(per_day.values()),
+        "daily_appointments": daily_counts,
+        "status_breakdown": dict(per_status),
+        "location_breakdown": [
+            {"name": name, "count": count} for name, count in per_location.most_common()
+        ],
+        "service_breakdown": [
+            {"name": name, "count": count} for name, count in per_service.most_common()
+        ],
+    }
+
+
+def rebuild_daily_stats(since=None, batch_size=1000):
+    """
+    Recomputes the DailyAppointmentStat rollup from the Appointment table
+    (everything, or only days from `since` onwards) in one transaction.
+    Returns the number of rollup rows written.
+    """
+    appointments = Appointment.objects.all()
+    stale = DailyAppointmentStat.objects.all()
+    if since is not None:
+        # Cut off at local midnight so it matches the rollup's buckets (a range
+        # on the column, unlike __date, can use the start_time indexes)
+        appointments = appointments.filter(start_time__gte=timezone.make_aware(datetime.combine(since, time.min)))
+        stale = stale.filter(date__gte=since)
+
+    grouped = (
+        appointments
+        .annotate(day=TruncDate('start_time', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'service_id', 'therapist_id', 'location_id', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        stale.delete()
+        return len(DailyAppointmentStat.objects.bulk_create((
+            DailyAppointmentStat(
+                date=row['day'],
+                service_id=row['service_id'],
+                therapist_id=row['therapist_id'],
+                location_id=row['location_id'],
+                status=row['status'],
+                count=row['total'],
+            )
+            for row in grouped.iterator(chunk_size=batch_size)
+        ), batch_size=batch_size))
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import json
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from unittest import mock
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User, PatientProfile, TherapistProfile
+from .models import Service, Appointment, ClinicalNote, Location, DailyAppointmentStat, Availability, ClinicOperatingHour
+from .scheduling import merge_intervals, subtract_intervals, intersect_intervals, saturated_intervals, split_into_slots
+from .stats import rebuild_daily_stats
+from .exceptions import booking_conflict
+from .pagination import AppointmentCursorPagination
+from mental_health_clinic.serializers import build_rows
+
+
+class AppointmentListQueryCountTests(TestCase):
+    """
+    The appointment list must cost a fixed number of queries no matter
+    how many rows are returned (no N+1 from the nested serializers).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='pass12345', email='admin@clinic.local')
+
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+
+        patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        cls.patient = PatientProfile.objects.create(user=patient_user, date_of_birth=date(1990, 1, 1))
+
+        cls.service = Service.objects.create(name='CBT Session', duration_minutes=60)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _add_appointments(self, count):
+        # Continue after the existing rows: one therapist can't be double-booked
+        start = timezone.now() + timedelta(days=Appointment.objects.count())
+        for i in range(count):
+            appointment = Appointment.objects.create(
+                patient=self.patient,
+                therapist=self.therapist,
+                service=self.service,
+                start_time=start + timedelta(days=i),
+            )
+            ClinicalNote.objects.create(
+                appointment=appointment,
+                patient=self.patient,
+                therapist=self.therapist,
+                subjective_analysis='Stable',
+                treatment_plan='Continue',
+            )
+
+    def _count_list_queries(self, user):
+        # Fresh instance each time so cached profile lookups don't skew the count
+        self.client.force_authenticate(user=User.objects.get(pk=user.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/appointments/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def _assert_constant_queries(self, user):
+        self._add_appointments(1)
+        small, _ = self._count_list_queries(user)
+
+        self._add_appointments(10)
+        large, response = self._count_list_queries(user)
+
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(small, large)
+
+    def test_admin_list_query_count_is_constant(self):
+        self._assert_constant_queries(self.admin)
+
+    def test_patient_list_query_count_is_constant(self):
+        self._assert_constant_queries(self.patient.user)
+
+    def test_therapist_list_query_count_is_constant(self):
+        self._assert_constant_queries(self.therapist.user)
+
+    def _get_sparse(self, params):
+        self.client.force_authenticate(user=self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/appointments/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_fields_trim_payload_joins_and_columns(self):
+        self._add_appointments(3)
+        response, queries = self._get_sparse({'fields': 'id,start_time,therapist_details.user.last_name'})
+
+        self.assertEqual(set(response.data[0]), {'id', 'start_time', 'therapist_details'})
+        self.assertEqual(response.data[0]['therapist_details'], {'user': {'last_name': ''}})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('medical_history', queries[0])
+        self.assertNotIn('appointments_clinicalnote', queries[0])
+        self.assertNotIn('appointments_service', queries[0])
+
+    def test_expand_keeps_only_listed_nested_objects(self):
+        self._add_appointments(2)
+        response, queries = self._get_sparse({'expand': 'service_details'})
+
+        row = response.data[0]
+        self.assertEqual(row['service_details']['name'], 'CBT Session')
+        self.assertNotIn('patient_details', row)
+        self.assertNotIn('clinical_note', row)
+        self.assertIn('status', row)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('users_patientprofile', queries[0])
+
+    def test_flat_shapes_skip_the_serializer_with_the_same_output(self):
+        self._add_appointments(3)
+        fields = 'id,start_time,end_time,status,therapist,service_details,clinical_note.treatment_plan'
+        with mock.patch('appointments.views.build_rows', wraps=build_rows) as fast_path:
+            fast, queries = self._get_sparse({'fields': fields})
+        fast_path.assert_called_once()
+        self.assertEqual(len(queries), 1)
+
+        slow, _ = self._get_sparse({'fields': fields, 'page_size': 50})  # Paginated: serializer path
+        self.assertEqual(json.loads(fast.content), json.loads(slow.content)['results'])
+
+    @mock.patch.object(AppointmentCursorPagination, 'max_unwindowed_rows', 2)
+    def test_flat_shapes_respect_the_row_cap(self):
+        self._add_appointments(3)
+        response, queries = self._get_sparse({'fields': 'id,status'})
+        expected = list(Appointment.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in response.data], expected[:2])
+        self.assertIn('cursor=', response['Link'])
+        self.assertEqual(len(queries), 1)
+
+    def test_sparse_fields_work_with_cursor_pages(self):
+        self._add_appointments(3)
+        response, queries = self._get_sparse({'fields': 'id', 'page_size': 2})
+        self.assertEqual([set(row) for row in response.data['results']], [{'id'}, {'id'}])
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(len(queries), 1)
+
+
+class AppointmentWindowAndCursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='pass12345', email='admin@clinic.local')
+
+        therapists = [
+            TherapistProfile.objects.create(
+                user=User.objects.create_user(username=f'doc{i}', password='pass12345', is_staff=True, role='THERAPIST'),
+                license_number=f'LIC-{i}', specialization='CBT',
+            )
+            for i in range(2)
+        ]
+
+        patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        patient = PatientProfile.objects.create(user=patient_user, date_of_birth=date(1990, 1, 1))
+
+        service = Service.objects.create(name='CBT Session', duration_minutes=60)
+
+        cls.base = timezone.make_aware(timezone.datetime(2026, 3, 2, 9, 0))
+        # Two appointments per day share a start_time (with different therapists)
+        # so the id tie-break is exercised
+        for day in range(5):
+            for therapist in therapists:
+                Appointment.objects.create(
+                    patient=patient, therapist=therapist, service=service,
+                    start_time=cls.base + timedelta(days=day),
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_unpaginated_list_is_plain_array(self):
+        response = self.client.get('/api/appointments/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 10)
+
+    @mock.patch.object(AppointmentCursorPagination, 'max_unwindowed_rows', 4)
+    def test_unwindowed_list_is_capped(self):
+        response = self.client.get('/api/appointments/')
+        expected = list(Appointment.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in response.data], expected[:4])
+
+        # The rest is one cursor away
+        next_link = response['Link'].split(';')[0].strip('<>')
+        rest = self.client.get(next_link)
+        self.assertEqual([row['id'] for row in rest.data['results']], expected[4:])
+
+        response = self.client.get('/api/appointments/', {'start': '2026-03-02'})
+        self.assertEqual(len(response.data), 10)
+        self.assertFalse(response.has_header('Link'))
+
+    def test_date_window_limits_rows(self):
+        response = self.client.get('/api/appointments/', {'start': '2026-03-03', 'end': '2026-03-04'})
+        self.assertEqual(len(response.data), 4)
+
+    def test_invalid_window_is_rejected(self):
+        response = self.client.get('/api/appointments/', {'start': 'next tuesday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_walks_every_row_once(self):
+        seen = []
+        response = self.client.get('/api/appointments/', {'page_size': 3})
+        while True:
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(Appointment.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/appointments/', {'page_size': 4})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']],
+        )
+
+
+class AdminDashboardStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='pass12345', email='admin@clinic.local')
+
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+
+        patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        patient = PatientProfile.objects.create(user=patient_user, date_of_birth=date(1990, 1, 1))
+
+        cbt = Service.objects.create(name='CBT Session', duration_minutes=60)
+        intake = Service.objects.create(name='Initial Consultation', duration_minutes=30)
+        main = Location.objects.create(name='Main Clinic')
+
+        now = timezone.localtime()
+        # Inside the 7 day window
+        Appointment.objects.create(patient=patient, therapist=therapist, service=cbt, location=main, start_time=now)
+        Appointment.objects.create(
+            patient=patient, therapist=therapist, service=cbt, start_time=now - timedelta(days=2),
+            status=Appointment.Status.CANCELLED,
+        )
+        # Only inside the 30 day window
+        Appointment.objects.create(patient=patient, therapist=therapist, service=intake, start_time=now - timedelta(days=20))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_weekly_stats_read_only_the_rollup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/admin-stats/')
+        self.assertEqual(response.status_code, 200)
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(len([q for q in sql if 'appointments_dailyappointmentstat' in q]), 1)
+        self.assertFalse([q for q in sql if 'FROM "appointments_appointment"' in q])
+
+        data = response.data
+        self.assertEqual(len(data['daily_appointments']), 7)
+        self.assertEqual(sum(data['daily_appointments'].values()), 2)
+        self.assertEqual(data['status_breakdown']['CANCELLED'], 1)
+        self.assertEqual(data['service_breakdown'], [{'name': 'CBT Session', 'count': 2}])
+        self.assertIn({'name': 'Main Clinic', 'count': 1}, data['location_breakdown'])
+
+    def test_service_breakdown_is_scoped_to_window(self):
+        response = self.client.get('/api/admin-stats/', {'days': 30})
+        self.assertEqual(len(response.data['daily_appointments']), 30)
+        self.assertEqual(response.data['total_appointments'], 3)
+        self.assertIn({'name': 'Initial Consultation', 'count': 1}, response.data['service_breakdown'])
+
+    def test_unsupported_window_is_rejected(self):
+        response = self.client.get('/api/admin-stats/', {'days': 12})
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyAppointmentStatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+
+        patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        cls.patient = PatientProfile.objects.create(user=patient_user, date_of_birth=date(1990, 1, 1))
+
+        cls.service = Service.objects.create(name='CBT Session', duration_minutes=60)
+
+    def _book(self, **kwargs):
+        return Appointment.objects.create(
+            patient=self.patient, therapist=self.therapist, service=kwargs.pop('service', self.service),
+            start_time=kwargs.pop('start_time', timezone.now()), **kwargs
+        )
+
+    def _snapshot(self):
+        return sorted(
+            DailyAppointmentStat.objects.filter(count__gt=0)
+            .values_list('date', 'service_id', 'therapist_id', 'location_id', 'status', 'count')
+        )
+
+    def test_save_moves_count_between_buckets(self):
+        appointment = self._book()
+        self.assertEqual(DailyAppointmentStat.objects.get(status='PENDING').count, 1)
+
+        appointment.status = Appointment.Status.CANCELLED
+        appointment.save()
+
+        self.assertEqual(DailyAppointmentStat.objects.get(status='PENDING').count, 0)
+        self.assertEqual(DailyAppointmentStat.objects.get(status='CANCELLED').count, 1)
+
+    def test_cancel_action_updates_rollup(self):
+        appointment = self._book()
+        client = APIClient()
+        client.force_authenticate(user=self.patient.user)
+
+        response = client.post(f'/api/appointments/{appointment.pk}/cancel/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DailyAppointmentStat.objects.get(status='CANCELLED').count, 1)
+
+    def test_delete_removes_count(self):
+        self._book().delete()
+        self.assertEqual(self._snapshot(), [])
+
+    def test_deleting_a_service_keeps_its_appointments_counted(self):
+        intake = Service.objects.create(name='Intake', duration_minutes=30)
+        start = timezone.make_aware(datetime(2030, 3, 4, 9))
+        self._book(start_time=start)
+        self._book(start_time=start + timedelta(hours=1), service=intake)
+
+        intake.delete()  # Moves its bucket to "no service"
+        self.service.delete()  # Collides with that bucket, so the two merge
+
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertEqual(DailyAppointmentStat.objects.get().count, 2)
+        incremental = self._snapshot()
+        rebuild_daily_stats()
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self._book()
+        self._book(start_time=timezone.now() - timedelta(days=3))
+        moved = self._book(start_time=timezone.now() - timedelta(days=1))
+        moved.start_time = timezone.now() + timedelta(days=2)
+        moved.save()
+
+        incremental = self._snapshot()
+        rebuild_daily_stats()
+        self.assertEqual(self._snapshot(), incremental)
+
+
+def _at(hour, minute=0):
+    return datetime(2030, 3, 4, hour, minute)
+
+
+class IntervalHelperTests(SimpleTestCase):
+
+    def test_merge_joins_overlapping_and_touching(self):
+        merged = merge_intervals([(_at(11), _at(12)), (_at(9), _at(10)), (_at(10), _at(10, 30)), (_at(11, 30), _at(13))])
+        self.assertEqual(merged, [(_at(9), _at(10, 30)), (_at(11), _at(13))])
+
+    def test_subtract_splits_free_time(self):
+        free = [(_at(9), _at(17))]
+        busy = [(_at(8), _at(9, 30)), (_at(12), _at(13)), (_at(16, 30), _at(18))]
+        self.assertEqual(
+            subtract_intervals(free, busy),
+            [(_at(9, 30), _at(12)), (_at(13), _at(16, 30))],
+        )
+
+    def test_intersect(self):
+        first = [(_at(8), _at(12)), (_at(13), _at(18))]
+        second = [(_at(9), _at(17))]
+        self.assertEqual(intersect_intervals(first, second), [(_at(9), _at(12)), (_at(13), _at(17))])
+
+    def test_saturated_respects_capacity(self):
+        bookings = [(_at(9), _at(10)), (_at(9, 30), _at(10, 30)), (_at(10, 30), _at(11))]
+        self.assertEqual(saturated_intervals(bookings, 2), [(_at(9, 30), _at(10))])
+        # Back-to-back bookings never overlap
+        self.assertEqual(saturated_intervals(bookings[1:], 2), [])
+
+    def test_split_into_slots(self):
+        slots = split_into_slots([(_at(9), _at(11, 30))], timedelta(hours=1), step=timedelta(minutes=30))
+        self.assertEqual([start for start, _ in slots], [_at(9), _at(9, 30), _at(10), _at(10, 30)])
+
+
+class AvailabilitySlotsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 3, 4)  # A Monday, safely in the future
+
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+        other_user = User.objects.create_user(username='doc2', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.other = TherapistProfile.objects.create(user=other_user, license_number='LIC-2', specialization='DBT')
+
+        cls.patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        cls.patient = PatientProfile.objects.create(user=cls.patient_user, date_of_birth=date(1990, 1, 1))
+
+        cls.service = Service.objects.create(name='CBT Session', duration_minutes=60)
+        cls.location = Location.objects.create(name='Main', address='1 Road', rooms=1)
+
+        ClinicOperatingHour.objects.create(day_of_week='Monday', is_open=True, start_time=time(10), end_time=time(16))
+        ClinicOperatingHour.objects.create(day_of_week='Tuesday', is_open=False)
+
+        for therapist in (cls.therapist, cls.other):
+            for day in (cls.day, cls.day + timedelta(days=1)):
+                Availability.objects.create(therapist=therapist, date=day, start_time=time(8), end_time=time(13))
+
+        # Booked 11:00-12:00 with the first therapist, in the only room
+        Appointment.objects.create(
+            patient=cls.patient, therapist=cls.therapist, service=cls.service, location=cls.location,
+            start_time=timezone.make_aware(datetime.combine(cls.day, time(11))),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.get(pk=self.patient_user.pk))
+
+    def _starts(self, entry):
+        return [timezone.localtime(slot['start']).time() for slot in entry['slots']]
+
+    def test_slots_clamp_to_hours_and_skip_bookings(self):
+        response = self.client.get('/api/availability/slots/', {
+            'therapist_id': self.therapist.user_id, 'start': '2030-03-04', 'end': '2030-03-05',
+            'service': self.service.id,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        # Opens at 10, closed on Tuesday, 11:00 taken
+        self.assertEqual(self._starts(response.data[0]), [time(10), time(12)])
+
+    def test_full_location_blocks_other_therapists(self):
+        response = self.client.get('/api/availability/slots/', {
+            'start': '2030-03-04', 'end': '2030-03-04', 'service': self.service.id, 'location': self.location.id,
+        })
+        by_therapist = {entry['therapist']: self._starts(entry) for entry in response.data}
+        self.assertEqual(by_therapist[self.other.id], [time(10), time(12)])
+
+    def test_query_count_does_not_grow_with_range(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/availability/slots/', {'start': '2030-03-04', 'end': '2030-03-30', 'location': self.location.id})
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+    def test_invalid_range_is_rejected(self):
+        response = self.client.get('/api/availability/slots/', {'start': '2030-03-05', 'end': '2030-03-04'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_ids_are_rejected(self):
+        for params in ({'service': 'abc'}, {'location': 'x'}, {'service': 999999}, {'therapist_id': '5a'}, {'step': '-5'}):
+            response = self.client.get('/api/availability/slots/', {'start': '2030-03-04', **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data)
+
+
+class BookingConflictMappingTests(SimpleTestCase):
+
+    def _error(self, constraint):
+        driver_error = Exception('conflicting key value violates exclusion constraint')
+        driver_error.diag = SimpleNamespace(constraint_name=constraint)
+        error = IntegrityError(*driver_error.args)
+        error.__cause__ = driver_error
+        return error
+
+    def test_booking_constraints_map_to_409(self):
+        conflict = booking_conflict(self._error(Appointment.THERAPIST_OVERLAP_CONSTRAINT))
+        self.assertEqual(conflict.status_code, 409)
+
+    def test_other_integrity_errors_are_left_alone(self):
+        self.assertIsNone(booking_conflict(self._error('some_other_constraint')))
+
+
+class BookingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+        other_user = User.objects.create_user(username='doc2', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.other = TherapistProfile.objects.create(user=other_user, license_number='LIC-2', specialization='DBT')
+        third_user = User.objects.create_user(username='doc3', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.third = TherapistProfile.objects.create(user=third_user, license_number='LIC-3', specialization='EMDR')
+
+        cls.patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        PatientProfile.objects.create(user=cls.patient_user, date_of_birth=date(1990, 1, 1))
+
+        cls.service = Service.objects.create(name='CBT Session', duration_minutes=60)
+        cls.location = Location.objects.create(name='Main', address='1 Road', rooms=2)
+        cls.start = timezone.make_aware(datetime(2030, 3, 4, 10))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.get(pk=self.patient_user.pk))
+
+    def book(self, therapist, start=None, location=None):
+        payload = {
+            'therapist': therapist.id,
+            'service': self.service.id,
+            'start_time': (start or self.start).isoformat(),
+        }
+        if location:
+            payload['location'] = location.id
+        return self.client.post('/api/appointments/', payload, format='json')
+
+    def test_first_booking_gets_a_room(self):
+        response = self.book(self.therapist, location=self.location)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['room'], 1)
+
+    @skipUnless(connection.vendor == 'postgresql', "Exclusion constraints need PostgreSQL")
+    def test_overlapping_therapist_booking_is_409(self):
+        self.assertEqual(self.book(self.therapist).status_code, 201)
+        response = self.book(self.therapist, start=self.start + timedelta(minutes=30))
+        self.assertEqual(response.status_code, 409)
+        # Back-to-back is fine
+        self.assertEqual(self.book(self.therapist, start=self.start + timedelta(hours=1)).status_code, 201)
+
+    @skipUnless(connection.vendor == 'postgresql', "Exclusion constraints need PostgreSQL")
+    def test_rooms_fill_up_then_409(self):
+        self.assertEqual(self.book(self.therapist, location=self.location).data['room'], 1)
+        self.assertEqual(self.book(self.other, location=self.location).data['room'], 2)
+        self.assertEqual(self.book(self.third, location=self.location).status_code, 409)
+
+    @skipUnless(connection.vendor == 'postgresql', "Exclusion constraints need PostgreSQL")
+    def test_cancelled_appointments_free_the_slot(self):
+        first = self.book(self.therapist)
+        Appointment.objects.filter(pk=first.data['id']).update(status=Appointment.Status.CANCELLED)
+        self.assertEqual(self.book(self.therapist).status_code, 201)
+
+
+class RecurringAvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=cls.therapist_user, license_number='LIC-1', specialization='CBT')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.get(pk=self.therapist_user.pk))
+
+    def post_schedule(self, **overrides):
+        payload = {
+            'start_date': '2030-04-01',  # Monday
+            'end_date': '2030-06-30',
+            'weekly': [
+                {'day_of_week': 'Monday', 'start_time': '09:00', 'end_time': '12:00'},
+                {'day_of_week': 'Monday', 'start_time': '13:00', 'end_time': '17:00'},
+                {'day_of_week': 'Thursday', 'start_time': '09:00', 'end_time': '12:00'},
+            ],
+            'exceptions': ['2030-04-08'],
+        }
+        payload.update(overrides)
+        return self.client.post('/api/availability/bulk/', payload, format='json')
+
+    def test_quarter_is_one_request_and_few_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_schedule()
+        self.assertEqual(response.status_code, 201)
+        # 13 Mondays x 2 blocks (one Monday skipped) + 13 Thursdays
+        self.assertEqual(response.data['created'], 12 * 2 + 13)
+        self.assertEqual(Availability.objects.filter(therapist=self.therapist).count(), 37)
+        self.assertFalse(Availability.objects.filter(date=date(2030, 4, 8)).exists())
+        self.assertLess(len(ctx.captured_queries), 10)
+
+    def test_existing_rows_are_skipped(self):
+        self.post_schedule()
+        response = self.post_schedule()
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['skipped'], 37)
+
+    def test_invalid_block_is_rejected(self):
+        response = self.post_schedule(weekly=[{'day_of_week': 'Monday', 'start_time': '12:00', 'end_time': '09:00'}])
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchAppointmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='pass12345', email='admin@clinic.local')
+
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+        cover_user = User.objects.create_user(username='cover', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.cover = TherapistProfile.objects.create(user=cover_user, license_number='LIC-2', specialization='CBT')
+
+        cls.patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        cls.patient = PatientProfile.objects.create(user=cls.patient_user, date_of_birth=date(1990, 1, 1))
+
+        cls.service = Service.objects.create(name='CBT Session', duration_minutes=60)
+
+    def setUp(self):
+        base = timezone.make_aware(datetime(2030, 3, 4, 9))
+        self.appointments = [
+            Appointment.objects.create(
+                patient=self.patient, therapist=self.therapist, service=self.service,
+                start_time=base + timedelta(days=day),
+            )
+            for day in range(6)
+        ]
+        self.done = self.appointments[-1]
+        self.done.status = Appointment.Status.COMPLETED
+        self.done.save()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def _snapshot(self):
+        return sorted(
+            DailyAppointmentStat.objects.filter(count__gt=0)
+            .values_list('date', 'service_id', 'therapist_id', 'location_id', 'status', 'count')
+        )
+
+    def assertRollupConsistent(self):
+        incremental = self._snapshot()
+        rebuild_daily_stats()
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_batch_cancel_reports_each_id(self):
+        first = self.appointments[0].pk
+        response = self.client.post('/api/appointments/batch-cancel/', {'ids': [first, self.done.pk, 999999]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['results'], {
+            str(first): 'ok', str(self.done.pk): 'invalid_transition', '999999': 'not_found',
+        })
+        self.assertEqual(Appointment.objects.get(pk=first).status, Appointment.Status.CANCELLED)
+        self.assertRollupConsistent()
+
+    def test_query_count_does_not_grow_with_batch(self):
+        ids = [appointment.pk for appointment in self.appointments[:5]]
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/appointments/batch-status/', {'ids': ids, 'status': 'CONFIRMED'}, format='json')
+        # One SELECT ... FOR UPDATE, one UPDATE, then a bump per distinct rollup bucket
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "appointments_appointment"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Appointment.objects.filter(status='CONFIRMED').count(), 5)
+        self.assertRollupConsistent()
+
+    def test_batch_reschedule_moves_therapist_and_time(self):
+        moved = self.appointments[0]
+        original_start = moved.start_time
+        response = self.client.post('/api/appointments/batch-reschedule/', {
+            'ids': [moved.pk, self.done.pk], 'therapist': self.cover.pk, 'shift_minutes': 60 * 24 * 7,
+        }, format='json')
+
+        self.assertEqual(response.data['results'], {str(moved.pk): 'ok', str(self.done.pk): 'invalid_transition'})
+        moved.refresh_from_db()
+        self.assertEqual(moved.therapist, self.cover)
+        self.assertEqual(moved.start_time, original_start + timedelta(days=7))
+        self.assertEqual(moved.end_time - moved.start_time, timedelta(minutes=60))
+        self.assertRollupConsistent()
+
+    def test_cannot_reassign_to_a_therapist_on_leave(self):
+        self.cover.status = 'On Leave'
+        self.cover.save()
+        User.objects.filter(pk=self.cover.user_id).update(is_active=False)
+
+        moved = self.appointments[0]
+        response = self.client.post('/api/appointments/batch-reschedule/', {
+            'ids': [moved.pk], 'therapist': self.cover.pk,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('therapist', response.data)
+        moved.refresh_from_db()
+        self.assertEqual(moved.therapist, self.therapist)
+
+    def test_contiguous_block_shifts_without_false_conflicts(self):
+        start = timezone.make_aware(datetime(2030, 3, 11, 9))
+        block = [
+            Appointment.objects.create(patient=self.patient, therapist=self.therapist, service=self.service,
+                                       start_time=start + timedelta(hours=hour))
+            for hour in range(3)
+        ]
+        ids = [appointment.pk for appointment in block]
+
+        for shift in (60, -60):
+            response = self.client.post('/api/appointments/batch-reschedule/', {
+                'ids': ids, 'shift_minutes': shift,
+            }, format='json')
+            self.assertEqual(response.data['results'], {str(pk): 'ok' for pk in ids})
+
+        starts = list(Appointment.objects.filter(pk__in=ids).order_by('start_time').values_list('start_time', flat=True))
+        self.assertEqual(starts, [start + timedelta(hours=hour) for hour in range(3)])
+        self.assertRollupConsistent()
+
+    def test_patients_cannot_use_batch_endpoints(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.patient_user.pk))
+        response = self.client.post('/api/appointments/batch-cancel/', {'ids': [self.appointments[0].pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    @skipUnless(connection.vendor == 'postgresql', "Exclusion constraints need PostgreSQL")
+    def test_reschedule_conflicts_are_reported_per_id(self):
+        base = self.appointments[0].start_time
+        Appointment.objects.create(patient=self.patient, therapist=self.cover, service=self.service, start_time=base)
+
+        response = self.client.post('/api/appointments/batch-reschedule/', {
+            'ids': [self.appointments[0].pk, self.appointments[1].pk], 'therapist': self.cover.pk,
+        }, format='json')
+
+        self.assertEqual(response.data['results'], {
+            str(self.appointments[0].pk): 'conflict', str(self.appointments[1].pk): 'ok',
+        })
+
+
+class MasterDataCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(name='Main', address='1 Road', rooms=2)
+        Service.objects.create(name='CBT Session', duration_minutes=60)
+        Service.objects.create(name='Retired Session', duration_minutes=60, is_active=False)
+        cls.admin = User.objects.create_user(username='boss', password='pass12345', role='ADMIN', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_second_read_skips_the_database(self):
+        self.client.get('/api/locations/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/locations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_matching_etag_gets_304(self):
+        first = self.client.get('/api/locations/')
+        response = self.client.get('/api/locations/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_save_invalidates(self):
+        first = self.client.get('/api/locations/')
+        self.location.rooms = 3
+        self.location.save()
+
+        response = self.client.get('/api/locations/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['rooms'], 3)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_service_cache_is_split_by_role(self):
+        self.assertEqual(len(self.client.get('/api/services/').data), 1)
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(len(self.client.get('/api/services/').data), 2)
+
+    def test_revalidating_after_a_role_change_gets_the_new_variant(self):
+        public = self.client.get('/api/services/')
+        self.assertNotIn('Last-Modified', public)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/services/', HTTP_IF_NONE_MATCH=public['ETag'],
+                                   HTTP_IF_MODIFIED_SINCE='Tue, 01 Jan 2030 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
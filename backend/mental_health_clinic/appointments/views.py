@@ -1,18 +1,25 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
+import logging
+from datetime import timedelta
+
+from django.db import transaction
 from django.utils import timezone
 from .models import ClinicalNote, Availability
 from .serializers import ServiceSerializer, AppointmentSerializer, ClinicalNoteSerializer, PatientSerializer, AvailabilitySerializer
+from .serializers import RecurringAvailabilitySerializer, BatchIdsSerializer, BatchStatusSerializer, BatchRescheduleSerializer
+from .serializers import SlotSearchSerializer
 from users.models import PatientProfile
+from users.authentication import ClaimsJWTAuthentication
+from users.roles import resolve_role
 
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
-from datetime import timedelta
-from django.db.models import Count
+from rest_framework.renderers import BrowsableAPIRenderer
 from .models import Appointment, Service
 
 from .models import Location
@@ -21,41 +28,89 @@ from .serializers import LocationSerializer
 from .models import ClinicOperatingHour
 from .serializers import ClinicOperatingHourSerializer
 
+from .filters import StartTimeWindowFilter
+from .pagination import AppointmentCursorPagination
+from .stats import DASHBOARD_WINDOWS, build_dashboard_stats
+from .scheduling import find_open_slots
+from .booking import save_booking
+from .batch import APPLIED, transition_appointments, reschedule_appointments
+from .caching import CachedReadMixin
+from mental_health_clinic.serializers import build_rows, shape_queryset, values_plan
+from mental_health_clinic.renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
 class AppointmentViewSet(viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    # Reads can be authorized from the token claims alone (JWT_STATELESS_READS)
+    authentication_classes = [ClaimsJWTAuthentication]
+    # ?start=/&end= limit the list to the visible calendar range,
+    # ?page_size= switches on keyset pagination over (start_time, id)
+    filter_backends = [StartTimeWindowFilter]
+    pagination_class = AppointmentCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
-        user = self.request.user
+        # Join every relation the serializer will render in the same query,
+        # so listing N appointments costs one SELECT instead of 5+ per row.
+        # With ?fields= / ?expand= that is only the requested relations and
+        # columns (plus what the keyset pagination reads).
+        return shape_queryset(
+            self.get_role_queryset(), self.get_serializer(), extra_columns=('start_time',)
+        ).order_by('start_time', 'id')
+
+    def list(self, request, *args, **kwargs):
+        # Fast path for unpaginated lists whose (?fields=-trimmed) shape is
+        # all plain columns, e.g. the calendar's ?fields=id,start_time,end_time,
+        # status: dicts straight from values_list(), no serializer per row.
+        # The trailing start_time/pk give the row cap its cursor.
+        if self.paginator.get_page_size(request) is None:
+            plan = values_plan(self.get_serializer())
+            if plan is not None:
+                lookups, plan = plan
+                rows = self.filter_queryset(self.get_queryset()).values_list(*lookups, 'start_time', 'pk', named=True)
+                page = self.paginator.paginate_queryset(rows, request, view=self)
+                if page is None:
+                    return Response(build_rows(rows, plan))
+                return self.paginator.get_paginated_response(build_rows(page, plan))
+        return super().list(request, *args, **kwargs)
+
+    def get_role_queryset(self):
+        role = resolve_role(self.request)
 
         # 1. Admin / Superuser sees ALL
-        if user.is_superuser:
-            count = Appointment.objects.count()
-            print(f"   ✅ ADMIN MODE: Returning all {count} appointments")
+        if role.is_admin:
+            logger.debug("Appointment queryset scoped", extra={'scope': 'admin'})
             return Appointment.objects.all()
 
         # 2. Patient
-        if hasattr(user, 'patient_profile'):
-            print("   ✅ PATIENT MODE")
-            return Appointment.objects.filter(patient=user.patient_profile)
+        if role.is_patient:
+            logger.debug("Appointment queryset scoped", extra={'scope': 'patient'})
+            return Appointment.objects.filter(patient_id=role.patient_id)
 
         # 3. Therapist
-        if hasattr(user, 'therapist_profile'):
-            print("   ✅ THERAPIST MODE")
-            return Appointment.objects.filter(therapist=user.therapist_profile)
+        if role.is_therapist:
+            logger.debug("Appointment queryset scoped", extra={'scope': 'therapist'})
+            return Appointment.objects.filter(therapist_id=role.therapist_id)
 
         # 4. Fallback
-        print("   ❌ NO PROFILE FOUND: Returning empty list")
+        logger.debug("Appointment queryset scoped", extra={'scope': 'none'})
         return Appointment.objects.none()
 
     def perform_create(self, serializer):
         # This intercepts the POST request and forces the appointment
         # to be booked under the currently logged-in patient.
-        if hasattr(self.request.user, 'patient_profile'):
-            serializer.save(patient=self.request.user.patient_profile)
+        role = resolve_role(self.request)
+        if role.is_patient:
+            save_booking(serializer, patient=role.patient)
         else:
             raise ValidationError({"detail": "Only patients can book appointments."})
 
+    def perform_update(self, serializer):
+        # Rescheduling goes through the same constraints as a new booking
+        save_booking(serializer)
+
     @action(detail=True, methods=['post'], url_path='cancel')
     def cancel(self, request, pk=None):
         """
@@ -85,9 +140,61 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(appointment)
         return Response(serializer.data)
 
-class ServiceViewSet(viewsets.ModelViewSet):
+    # --- Batch operations (staff and therapists, limited to the rows they can see) ---
+    def _batch_queryset(self):
+        role = resolve_role(self.request)
+        if not (self.request.user.is_staff or role.is_therapist):
+            raise PermissionDenied("Only staff can change appointments in bulk.")
+        return self.get_role_queryset()
+
+    def _batch_response(self, results):
+        return Response({
+            "updated": sum(outcome == APPLIED for outcome in results.values()),
+            "results": {str(pk): outcome for pk, outcome in results.items()},
+        })
+
+    @action(detail=False, methods=['post'], url_path='batch-cancel')
+    def batch_cancel(self, request):
+        """POST /api/appointments/batch-cancel/ {"ids": [1, 2, 3]}"""
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._batch_response(transition_appointments(
+            self._batch_queryset(), serializer.validated_data['ids'], Appointment.Status.CANCELLED,
+        ))
+
+    @action(detail=False, methods=['post'], url_path='batch-status')
+    def batch_status(self, request):
+        """POST /api/appointments/batch-status/ {"ids": [...], "status": "CONFIRMED"}"""
+        serializer = BatchStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._batch_response(transition_appointments(
+            self._batch_queryset(), serializer.validated_data['ids'], serializer.validated_data['status'],
+        ))
+
+    @action(detail=False, methods=['post'], url_path='batch-reschedule')
+    def batch_reschedule(self, request):
+        """
+        POST /api/appointments/batch-reschedule/
+        {"ids": [...], "therapist": 4, "shift_minutes": 1440}
+        Either field may be left out. Ids that would clash come back as "conflict".
+        """
+        serializer = BatchRescheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        return self._batch_response(reschedule_appointments(
+            self._batch_queryset(), data['ids'],
+            therapist=data.get('therapist'), shift_minutes=data.get('shift_minutes'),
+        ))
+
+class ServiceViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
+
+    def get_cache_variant(self):
+        # Admins see inactive services too, so they get their own cache entry
+        user = self.request.user
+        return 'admin' if user.is_authenticated and user.role == 'ADMIN' else 'public'
 
     def get_queryset(self):
         user = self.request.user
@@ -102,19 +209,20 @@ class ServiceViewSet(viewsets.ModelViewSet):
 class PatientViewSet(viewsets.ModelViewSet):
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = [ClaimsJWTAuthentication]
 
     def get_queryset(self):
-        user = self.request.user
+        role = resolve_role(self.request)
 
         # 1. Therapist: See patients linked to my appointments
-        if hasattr(user, 'therapist_profile'):
+        if role.is_therapist:
             # "Find patients who have an appointment with Me"
             return PatientProfile.objects.filter(
-                appointments__therapist=user.therapist_profile
+                appointments__therapist_id=role.therapist_id
             ).distinct()
 
         # 2. Admin: See everyone
-        if user.is_superuser:
+        if role.is_admin:
             return PatientProfile.objects.all()
 
         return PatientProfile.objects.none()
@@ -122,35 +230,37 @@ class PatientViewSet(viewsets.ModelViewSet):
 class ClinicalNoteViewSet(viewsets.ModelViewSet):
     serializer_class = ClinicalNoteSerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = [ClaimsJWTAuthentication]
 
     def get_queryset(self):
-        user = self.request.user
+        role = resolve_role(self.request)
         # Only show notes written by this therapist
-        if hasattr(user, 'therapist_profile'):
-            return ClinicalNote.objects.filter(therapist=user.therapist_profile).order_by('-created_at')
+        if role.is_therapist:
+            return ClinicalNote.objects.filter(therapist_id=role.therapist_id).order_by('-created_at')
         return ClinicalNote.objects.none()
 
     def perform_create(self, serializer):
-        user = self.request.user
+        role = resolve_role(self.request)
 
         # 1. Check if the user actually has a therapist profile
-        if not hasattr(user, 'therapist_profile'):
+        if not role.is_therapist:
             raise ValidationError(
                 {"detail": "You must be a registered therapist to save clinical notes."}
             )
         # Auto-assign the therapist when saving
-        serializer.save(therapist=self.request.user.therapist_profile)
+        serializer.save(therapist=role.therapist)
 
 class AvailabilityViewSet(viewsets.ModelViewSet):
     serializer_class = AvailabilitySerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = [ClaimsJWTAuthentication]
 
     def get_queryset(self):
-        user = self.request.user
+        role = resolve_role(self.request)
 
         # 1. Therapist Mode: See and manage their own schedule
-        if hasattr(user, 'therapist_profile'):
-            return Availability.objects.filter(therapist=user.therapist_profile).order_by('date', 'start_time')
+        if role.is_therapist:
+            return Availability.objects.filter(therapist_id=role.therapist_id).order_by('date', 'start_time')
 
         # 2. Patient Mode: Look up a specific doctor's availability
         # The frontend will call: /api/availability/?therapist_id=5
@@ -159,67 +269,99 @@ class AvailabilityViewSet(viewsets.ModelViewSet):
             return Availability.objects.filter(therapist__user__id=therapist_id, date__gte=timezone.now().date()).order_by('date', 'start_time')
 
         # 3. Admin: See all
-        if user.is_superuser:
+        if role.is_admin:
             return Availability.objects.all()
 
         return Availability.objects.none()
 
     def perform_create(self, serializer):
         # Auto-assign the logged-in therapist when they create a new time slot
-        user = self.request.user
-        if hasattr(user, 'therapist_profile'):
-            serializer.save(therapist=user.therapist_profile)
+        role = resolve_role(self.request)
+        if role.is_therapist:
+            serializer.save(therapist=role.therapist)
         else:
             raise ValidationError({"detail": "Only therapists can set availability."})
 
+    BULK_BATCH_SIZE = 500
 
-class AdminDashboardStatsView(APIView):
-    # Only allow users with is_staff=True to access this
-    permission_classes = [IsAdminUser]
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Recurring schedule in one call: POST /api/availability/bulk/
+        {"start_date": "2026-04-01", "end_date": "2026-06-30",
+         "weekly": [{"day_of_week": "Monday", "start_time": "09:00", "end_time": "12:00"}, ...],
+         "exceptions": ["2026-04-13"]}
 
-    def get(self, request):
-        today = timezone.now().date()
+        Rows that already exist (same therapist, date and start time) are left
+        as they are. Everything is written in batched INSERTs in one transaction.
+        """
+        role = resolve_role(request)
+        if not role.is_therapist:
+            raise ValidationError({"detail": "Only therapists can set availability."})
 
-        # 1. Calculate "Appointments This Week" (Last 7 days)
-        week_start = today - timedelta(days=6)
+        serializer = RecurringAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        therapist = role.therapist
+        rows = list(serializer.expand(therapist))
 
-        # Get all appointments in the last 7 days
-        recent_appts = Appointment.objects.filter(
-            start_time__date__gte=week_start,
-            start_time__date__lte=today
+        existing = Availability.objects.filter(
+            therapist=therapist,
+            date__gte=serializer.validated_data['start_date'],
+            date__lte=serializer.validated_data['end_date'],
         )
+        with transaction.atomic():
+            before = existing.count()
+            Availability.objects.bulk_create(rows, batch_size=self.BULK_BATCH_SIZE, ignore_conflicts=True)
+            created = existing.count() - before
 
-        # Build a dictionary to hold the count for each day (e.g., {"Mon": 5, "Tue": 2})
-        daily_counts = {}
-        for i in range(7):
-            day = week_start + timedelta(days=i)
-            day_name = day.strftime("%a")  # Gets 'Mon', 'Tue', etc.
-            # Count appointments for this specific day
-            count = recent_appts.filter(start_time__date=day).count()
-            daily_counts[day_name] = count
-
-        # 2. Calculate "Service Breakdown" (Donut Chart)
-        # Group by service and count them
-        service_stats = Appointment.objects.values('service__name').annotate(count=Count('id'))
-
-        # Format the data cleanly for the frontend
-        service_breakdown = []
-        for stat in service_stats:
-            if stat['service__name']:  # Ignore nulls
-                service_breakdown.append({
-                    "name": stat['service__name'],
-                    "count": stat['count']
-                })
+        return Response({"requested": len(rows), "created": created, "skipped": len(rows) - created}, status=201)
 
-        return Response({
-            "daily_appointments": daily_counts,
-            "service_breakdown": service_breakdown
-        })
+    @action(detail=False, methods=['get'], url_path='slots')
+    def slots(self, request):
+        """
+        Bookable times computed server-side.
+        /api/availability/slots/?therapist_id=5&start=2026-03-01&end=2026-03-07&service=2&location=1
+
+        therapist_id (user id) is optional - without it every active therapist
+        is searched. The slot length comes from the service (default 60 min);
+        ?step= (minutes) sets how far apart slot starts are.
+        """
+        params = SlotSearchSerializer(data={key: value for key, value in request.query_params.items() if value})
+        params.is_valid(raise_exception=True)
+        search = params.validated_data
+
+        service = search.get('service')
+        step = search.get('step')
+        return Response(find_open_slots(
+            search['start'], search['end'],
+            timedelta(minutes=service.duration_minutes if service else 60),
+            therapist_user_id=search.get('therapist_id'),
+            location=search.get('location'),
+            step=timedelta(minutes=step) if step else None,
+        ))
+
+
+class AdminDashboardStatsView(APIView):
+    # Only allow users with is_staff=True to access this
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # ?days= picks the window length (7, 30 or 90 days, default 7)
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            days = None
+        if days not in DASHBOARD_WINDOWS:
+            raise ValidationError({"days": f"Choose one of {', '.join(map(str, DASHBOARD_WINDOWS))}."})
+
+        return Response(build_dashboard_stats(days))
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
 
-class ClinicOperatingHourViewSet(viewsets.ModelViewSet):
+class ClinicOperatingHourViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = ClinicOperatingHour.objects.all().order_by('id') # Keeps days in order
-    serializer_class = ClinicOperatingHourSerializer
\ No newline at end of file
+    serializer_class = ClinicOperatingHourSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
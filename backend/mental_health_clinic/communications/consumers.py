@@ -0,0 +1,44 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import user_group_name
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Push-only chat socket: ws://<host>/ws/chat/?token=<access token>
+
+    Messages are still sent through POST /api/messages/<id>/; this socket
+    delivers new messages and read receipts as they happen, so clients no
+    longer need to poll ChatThreadView for the whole history.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = user_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Keep-alive only; everything else goes through the REST endpoints
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    # --- Channel layer events ---
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_read(self, event):
+        await self.send_json({
+            'type': 'read',
+            'reader': event['reader'],
+            'sender': event['sender'],
+            'read_at': event['read_at'],
+        })
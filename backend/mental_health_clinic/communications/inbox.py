@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from users.models import PatientProfile, TherapistProfile
+from .models import Conversation
+
+User = get_user_model()
+
+SNIPPET_LENGTH = 80
+
+
+def with_conversation_summary(contacts, user):
+    """
+    Annotates a User queryset with the latest message exchanged with `user`,
+    its timestamp and how many of the contact's messages `user` hasn't read.
+
+    Reads the denormalised Conversation row for each pair (a unique-index
+    lookup), so the inbox is one query whose cost doesn't depend on how many
+    messages were ever sent.
+    """
+    conversation = Conversation.objects.filter(
+        Q(user_a=user, user_b=OuterRef('pk')) | Q(user_a=OuterRef('pk'), user_b=user)
+    )
+    # The logged-in user's own counter, whichever side of the pair they are on
+    my_unread = conversation.annotate(
+        mine=Case(When(user_a=user, then=F('unread_for_a')), default=F('unread_for_b'))
+    )
+
+    return contacts.annotate(
+        last_message=Subquery(conversation.values('last_message__content')[:1]),
+        last_message_at=Subquery(conversation.values('last_message_at')[:1]),
+        unread_count=Coalesce(Subquery(my_unread.values('mine')[:1], output_field=IntegerField()), Value(0)),
+    ).order_by(F('last_message_at').desc(nulls_last=True), 'first_name', 'id')
+
+
+def _contact_entry(request, contact, profile, name, tag):
+    image_url = request.build_absolute_uri(profile.profile_image.url) if profile.profile_image else None
+    snippet = contact.last_message or ''
+    if len(snippet) > SNIPPET_LENGTH:
+        snippet = snippet[:SNIPPET_LENGTH - 1] + '…'
+
+    return {
+        'id': contact.id,
+        'name': name,
+        'img': image_url,
+        'tag': tag,
+        'lastMsg': snippet or 'Click to view conversation...',
+        'unread': contact.unread_count,
+        'time': contact.last_message_at.isoformat() if contact.last_message_at else '',
+    }
+
+
+def therapist_inbox(request, therapist_profile):
+    """Patients who have booked with this therapist, most recent conversation first."""
+    patients = with_conversation_summary(
+        User.objects.filter(
+            patient_profile__in=PatientProfile.objects.filter(appointments__therapist=therapist_profile)
+        ).select_related('patient_profile'),
+        therapist_profile.user_id,
+    )
+
+    return [
+        _contact_entry(
+            request, patient, patient.patient_profile,
+            name=f"{patient.first_name} {patient.last_name}".strip() or patient.username,
+            tag='Patient',
+        )
+        for patient in patients
+    ]
+
+
+def patient_inbox(request, patient_profile):
+    """Therapists this patient has booked with, most recent conversation first."""
+    doctors = with_conversation_summary(
+        User.objects.filter(
+            therapist_profile__in=TherapistProfile.objects.filter(schedule__patient=patient_profile)
+        ).select_related('therapist_profile'),
+        patient_profile.user_id,
+    )
+
+    return [
+        _contact_entry(
+            request, doctor, doctor.therapist_profile,
+            name=f"Dr. {f'{doctor.first_name} {doctor.last_name}'.strip() or doctor.username}",
+            tag=doctor.therapist_profile.specialization or 'Therapist',
+        )
+        for doctor in doctors
+    ]
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest, Least
+
+from communications.models import Conversation, Message
+
+
+def rebuild_conversations(batch_size=1000):
+    """
+    Recomputes every Conversation row from the Message table with one grouped
+    query over the (lower id, higher id) pair. Returns the number of rows written.
+    """
+    pairs = (
+        Message.objects
+        .exclude(sender_id=F('receiver_id'))
+        .annotate(user_a=Least('sender_id', 'receiver_id'), user_b=Greatest('sender_id', 'receiver_id'))
+        .values('user_a', 'user_b')
+        .annotate(
+            last_id=Max('id'),
+            last_at=Max('timestamp'),
+            unread_a=Count('id', filter=Q(is_read=False, receiver_id=F('user_a'))),
+            unread_b=Count('id', filter=Q(is_read=False, receiver_id=F('user_b'))),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        Conversation.objects.all().delete()
+        return len(Conversation.objects.bulk_create((
+            Conversation(
+                user_a_id=row['user_a'],
+                user_b_id=row['user_b'],
+                last_message_id=row['last_id'],
+                last_message_at=row['last_at'],
+                unread_for_a=row['unread_a'],
+                unread_for_b=row['unread_b'],
+            )
+            for row in pairs.iterator(chunk_size=batch_size)
+        ), batch_size=batch_size))
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalised Conversation inbox rows from existing messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_conversations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} conversations."))
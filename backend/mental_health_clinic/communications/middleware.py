@@ -0,0 +1,34 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+        return User.objects.get(id=token['user_id'], is_active=True)
+    except (TokenError, KeyError, User.DoesNotExist):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with the same access tokens the
+    REST API uses. Browsers cannot set headers on a WebSocket handshake,
+    so the token travels in the query string (?token=...).
+    """
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = query.get('token', [None])[0]
+
+        scope['user'] = await get_user_for_token(raw_token) if raw_token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
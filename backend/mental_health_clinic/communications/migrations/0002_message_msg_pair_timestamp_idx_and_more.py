@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 15:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'timestamp'], name='msg_pair_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['receiver', 'sender'], name='msg_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest, Least
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('communications', 'Message')
+    Conversation = apps.get_model('communications', 'Conversation')
+
+    pairs = (
+        Message.objects
+        .exclude(sender_id=F('receiver_id'))
+        .annotate(user_a=Least('sender_id', 'receiver_id'), user_b=Greatest('sender_id', 'receiver_id'))
+        .values('user_a', 'user_b')
+        .annotate(
+            last_id=Max('id'),
+            last_at=Max('timestamp'),
+            unread_a=Count('id', filter=Q(is_read=False, receiver_id=F('user_a'))),
+            unread_b=Count('id', filter=Q(is_read=False, receiver_id=F('user_b'))),
+        )
+        .order_by()
+    )
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_a_id=row['user_a'],
+            user_b_id=row['user_b'],
+            last_message_id=row['last_id'],
+            last_message_at=row['last_at'],
+            unread_for_a=row['unread_a'],
+            unread_for_b=row['unread_b'],
+        )
+        for row in pairs
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0002_message_msg_pair_timestamp_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_for_a', models.PositiveIntegerField(default=0)),
+                ('unread_for_b', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='communications.message')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_b'], name='conversation_user_b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_a', 'user_b'), name='conversation_unique_pair'), models.CheckConstraint(condition=models.Q(('user_a__lt', models.F('user_b'))), name='conversation_ordered_pair')],
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
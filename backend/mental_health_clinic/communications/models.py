@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.conf import settings
 
 
@@ -21,5 +23,104 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Each half of the thread Q-filter (sender=A, receiver=B) ordered by timestamp
+            models.Index(fields=['sender', 'receiver', 'timestamp'], name='msg_pair_timestamp_idx'),
+            # Unread lookups only ever touch the small is_read=False slice
+            models.Index(
+                fields=['receiver', 'sender'],
+                name='msg_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
+
     def __str__(self):
         return f"From {self.sender.username} to {self.receiver.username} at {self.timestamp}"
+
+
+
+class Conversation(models.Model):
+    """
+    One row per pair of users who have exchanged messages, holding the
+    denormalised inbox data (latest message and each side's unread count).
+
+    The pair is stored ordered (user_a has the lower id) so both directions
+    map to the same row. Counters are kept current by ChatThreadView;
+    `python manage.py backfill_conversations` rebuilds them from Message.
+    """
+    user_a = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    # Messages each participant has received but not read yet
+    unread_for_a = models.PositiveIntegerField(default=0)
+    unread_for_b = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves lookups by user_a
+            models.UniqueConstraint(fields=['user_a', 'user_b'], name='conversation_unique_pair'),
+            models.CheckConstraint(condition=models.Q(user_a__lt=F('user_b')), name='conversation_ordered_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['user_b'], name='conversation_user_b_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.user_a_id} <-> {self.user_b_id}"
+
+    @staticmethod
+    def ordered_pair(first_id, second_id):
+        return (first_id, second_id) if first_id < second_id else (second_id, first_id)
+
+    @classmethod
+    def record_message(cls, message):
+        """
+        Moves the conversation's last message forward and bumps the receiver's
+        unread counter, in single UPDATE statements so concurrent sends don't
+        lose increments. Call inside the transaction that saved the message.
+        """
+        if message.sender_id == message.receiver_id:
+            return  # Notes to self never show up in an inbox
+
+        user_a, user_b = cls.ordered_pair(message.sender_id, message.receiver_id)
+        unread_field = 'unread_for_a' if message.receiver_id == user_a else 'unread_for_b'
+
+        pair = cls.objects.filter(user_a_id=user_a, user_b_id=user_b)
+        changes = {
+            # GREATEST keeps the newest message if two sends race
+            'last_message_id': Greatest(F('last_message_id'), Value(message.id)),
+            'last_message_at': Greatest(F('last_message_at'), Value(message.timestamp)),
+            unread_field: F(unread_field) + 1,
+        }
+        if pair.update(**changes):
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    user_a_id=user_a,
+                    user_b_id=user_b,
+                    last_message=message,
+                    last_message_at=message.timestamp,
+                    **{unread_field: 1},
+                )
+        except IntegrityError:
+            # The other participant created the row at the same moment
+            pair.update(**changes)
+
+    @classmethod
+    def mark_read(cls, reader_id, other_user_id, count):
+        """
+        Takes `count` just-read messages off the reader's unread counter.
+        Subtracting (rather than zeroing) keeps a message that lands
+        mid-request counted as unread.
+        """
+        user_a, user_b = cls.ordered_pair(reader_id, other_user_id)
+        unread_field = 'unread_for_a' if reader_id == user_a else 'unread_for_b'
+        cls.objects.filter(user_a_id=user_a, user_b_id=user_b).update(
+            **{unread_field: Greatest(F(unread_field) - count, Value(0))}
+        )
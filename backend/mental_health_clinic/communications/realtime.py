@@ -0,0 +1,40 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+
+def user_group_name(user_id):
+    """Every open socket of a user joins this group (one per tab/device)."""
+    return f"chat_user_{user_id}"
+
+
+def _send_to_users(user_ids, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for user_id in set(user_ids):
+        async_to_sync(channel_layer.group_send)(user_group_name(user_id), event)
+
+
+def push_new_message(message_data, sender_id, receiver_id):
+    """
+    Pushes a freshly saved message (already serialized) to both participants.
+    Sent after commit so clients never see a row that was rolled back.
+    """
+    transaction.on_commit(lambda: _send_to_users(
+        [sender_id, receiver_id],
+        {'type': 'chat.message', 'message': message_data},
+    ))
+
+
+def push_read_receipt(reader_id, other_user_id):
+    """
+    Tells both participants that `reader_id` has read everything
+    `other_user_id` sent them up to now.
+    """
+    read_at = timezone.now().isoformat()
+    transaction.on_commit(lambda: _send_to_users(
+        [reader_id, other_user_id],
+        {'type': 'chat.read', 'reader': reader_id, 'sender': other_user_id, 'read_at': read_at},
+    ))
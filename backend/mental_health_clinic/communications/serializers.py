@@ -15,4 +15,35 @@ class MessageSerializer(serializers.ModelSerializer):
         return f"{obj.sender.first_name} {obj.sender.last_name}".strip() or obj.sender.username
 
     def get_receiver_name(self, obj):
-        return f"{obj.receiver.first_name} {obj.receiver.last_name}".strip() or obj.receiver.username
\ No newline at end of file
+        return f"{obj.receiver.first_name} {obj.receiver.last_name}".strip() or obj.receiver.username
+
+
+MESSAGE_ROW_FIELDS = (
+    'id', 'sender_id', 'sender__first_name', 'sender__last_name', 'sender__username',
+    'receiver_id', 'receiver__first_name', 'receiver__last_name', 'receiver__username',
+    'content', 'timestamp', 'is_read',
+)
+
+_timestamp = serializers.DateTimeField()
+
+
+def message_rows(queryset):
+    """
+    Same output as MessageSerializer(queryset, many=True).data, built from
+    values_list() tuples: no model instances, no per-field serializer calls.
+    """
+    return [
+        {
+            'id': pk,
+            'sender': sender_id,
+            'sender_name': f"{sender_first} {sender_last}".strip() or sender_username,
+            'receiver': receiver_id,
+            'receiver_name': f"{receiver_first} {receiver_last}".strip() or receiver_username,
+            'content': content,
+            'timestamp': _timestamp.to_representation(timestamp),
+            'is_read': is_read,
+        }
+        for (pk, sender_id, sender_first, sender_last, sender_username,
+             receiver_id, receiver_first, receiver_last, receiver_username,
+             content, timestamp, is_read) in queryset.values_list(*MESSAGE_ROW_FIELDS)
+    ]
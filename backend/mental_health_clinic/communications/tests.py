@@ -1,3 +1,214 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from channels.testing import WebsocketCommunicator
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from mental_health_clinic.asgi import application
+from appointments.models import Appointment, Service
+from users.models import User, PatientProfile, TherapistProfile
+from .models import Message, Conversation
+from .serializers import MessageSerializer, message_rows
+from .management.commands.backfill_conversations import rebuild_conversations
+
+
+class ChatSocketTests(TransactionTestCase):
+    """
+    The consumer reaches the database from its own sync_to_async calls, so
+    these tests run outside a wrapping transaction: a TestCase transaction
+    would be shared with (and closed under) the event loop's DB access.
+    With autocommit, on_commit pushes fire as soon as each view commits.
+    """
+
+    def setUp(self):
+        self.patient = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        self.doctor = User.objects.create_user(username='doc', password='pass12345', role='THERAPIST', is_staff=True)
+
+    def _post_message(self, sender, receiver, content):
+        client = APIClient()
+        client.force_authenticate(user=sender)
+        return client.post(f'/api/messages/{receiver.id}/', {'content': content})
+
+    def _read_thread(self, reader, other):
+        client = APIClient()
+        client.force_authenticate(user=reader)
+        return client.get(f'/api/messages/{other.id}/')
+
+    async def test_socket_without_token_is_rejected(self):
+        communicator = WebsocketCommunicator(application, '/ws/chat/', headers=[(b'origin', b'http://localhost')])
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_new_message_and_read_receipt_are_pushed(self):
+        token = str(AccessToken.for_user(self.doctor))
+        communicator = WebsocketCommunicator(
+            application, f'/ws/chat/?token={token}', headers=[(b'origin', b'http://localhost')]
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        response = await sync_to_async(self._post_message)(self.patient, self.doctor, 'Hello doctor')
+        self.assertEqual(response.status_code, 201)
+
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['message']['content'], 'Hello doctor')
+        self.assertEqual(event['message']['sender'], self.patient.id)
+
+        # The doctor reading the thread sends a receipt back to both participants
+        await sync_to_async(self._read_thread)(self.doctor, self.patient)
+        receipt = await communicator.receive_json_from()
+        self.assertEqual(receipt['type'], 'read')
+        self.assertEqual(receipt['reader'], self.doctor.id)
+        self.assertTrue(await Message.objects.filter(is_read=True).aexists())
+
+        await communicator.disconnect()
+
+
+class ChatThreadPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(username='pat', password='pass12345', role='PATIENT', first_name='Pat')
+        cls.doctor = User.objects.create_user(username='doc', password='pass12345', role='THERAPIST', is_staff=True)
+        cls.ids = [
+            Message.objects.create(
+                sender=cls.patient if i % 2 else cls.doctor,
+                receiver=cls.doctor if i % 2 else cls.patient,
+                content=f'message {i}',
+            ).id
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.patient)
+
+    def _ids(self, response):
+        return [row['id'] for row in response.data]
+
+    def test_default_returns_latest_page_in_reading_order(self):
+        response = self.client.get(f'/api/messages/{self.doctor.id}/', {'limit': 5})
+        self.assertEqual(self._ids(response), self.ids[-5:])
+
+    def test_after_id_returns_newer_messages_oldest_first(self):
+        response = self.client.get(f'/api/messages/{self.doctor.id}/', {'after_id': self.ids[8]})
+        self.assertEqual(self._ids(response), self.ids[9:])
+
+    def test_before_id_scrolls_back_newest_first(self):
+        response = self.client.get(f'/api/messages/{self.doctor.id}/', {'before_id': self.ids[6], 'limit': 3})
+        self.assertEqual(self._ids(response), [self.ids[5], self.ids[4], self.ids[3]])
+
+    def test_names_do_not_cost_a_query_per_row(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/messages/{self.doctor.id}/')
+        selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[1]['sender_name'], 'Pat')
+
+    def test_fast_rows_match_the_serializer(self):
+        thread = Message.objects.order_by('id')
+        self.assertEqual(message_rows(thread), MessageSerializer(thread, many=True).data)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(f'/api/messages/{self.doctor.id}/', {'after_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class InboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        doctor = User.objects.create_user(username='doc', password='pass12345', role='THERAPIST', is_staff=True)
+        cls.therapist = TherapistProfile.objects.create(user=doctor, license_number='LIC-1', specialization='CBT')
+        service = Service.objects.create(name='CBT Session', duration_minutes=60)
+
+        cls.patients = []
+        start = timezone.now()
+        for i in range(3):
+            user = User.objects.create_user(username=f'pat{i}', password='pass12345', role='PATIENT', first_name=f'P{i}')
+            patient = PatientProfile.objects.create(user=user, date_of_birth=date(1990, 1, 1))
+            # Two bookings each, so a JOIN-based filter would duplicate contacts
+            for j in range(2):
+                Appointment.objects.create(patient=patient, therapist=cls.therapist, service=service,
+                                           start_time=start + timedelta(hours=2 * i + j))
+            cls.patients.append(user)
+
+        for sender, receiver, content in [
+            (cls.patients[0], doctor, 'first'),
+            (doctor, cls.patients[2], 'reply'),
+            (cls.patients[2], doctor, 'thanks'),
+            (cls.patients[2], doctor, 'see you'),
+        ]:
+            Conversation.record_message(Message.objects.create(sender=sender, receiver=receiver, content=content))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.therapist.user)
+
+    def test_inbox_is_sorted_by_recency_with_unread_counts(self):
+        response = self.client.get('/api/inbox/')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual([row['id'] for row in response.data], [p.id for p in (self.patients[2], self.patients[0], self.patients[1])])
+        latest = response.data[0]
+        self.assertEqual(latest['lastMsg'], 'see you')
+        self.assertEqual(latest['unread'], 2)
+        self.assertNotEqual(latest['time'], '')
+        self.assertEqual(response.data[2]['unread'], 0)
+
+    def test_inbox_cost_does_not_grow_with_contacts(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/inbox/')
+
+    def test_patients_list_shares_the_inbox_data(self):
+        inbox = self.client.get('/api/inbox/').data
+        legacy = self.client.get('/api/users/patients-list/').data
+        self.assertEqual(inbox, legacy)
+
+
+class ConversationCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        cls.doctor = User.objects.create_user(username='doc', password='pass12345', role='THERAPIST', is_staff=True)
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def _conversation(self):
+        return Conversation.objects.get()
+
+    def test_post_and_read_maintain_counters(self):
+        patient, doctor = self._client(self.patient), self._client(self.doctor)
+        patient.post(f'/api/messages/{self.doctor.id}/', {'content': 'one'})
+        patient.post(f'/api/messages/{self.doctor.id}/', {'content': 'two'})
+
+        conversation = self._conversation()
+        doctor_is_a = conversation.user_a_id == self.doctor.id
+        self.assertEqual(conversation.unread_for_a if doctor_is_a else conversation.unread_for_b, 2)
+        self.assertEqual(conversation.last_message.content, 'two')
+
+        doctor.get(f'/api/messages/{self.patient.id}/')
+        conversation.refresh_from_db()
+        self.assertEqual((conversation.unread_for_a, conversation.unread_for_b), (0, 0))
+
+    def test_backfill_matches_incremental_counters(self):
+        patient = self._client(self.patient)
+        patient.post(f'/api/messages/{self.doctor.id}/', {'content': 'one'})
+        self._client(self.doctor).post(f'/api/messages/{self.patient.id}/', {'content': 'two'})
+        patient.post(f'/api/messages/{self.doctor.id}/', {'content': 'three'})
+
+        fields = ('user_a_id', 'user_b_id', 'last_message_id', 'unread_for_a', 'unread_for_b')
+        incremental = list(Conversation.objects.values_list(*fields))
+        rebuild_conversations()
+        self.assertEqual(list(Conversation.objects.values_list(*fields)), incremental)
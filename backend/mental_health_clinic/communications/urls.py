@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import ChatThreadView
+from .views import ChatThreadView, InboxView
 
 urlpatterns = [
     path('messages/<int:other_user_id>/', ChatThreadView.as_view(), name='chat-thread'),
+    path('inbox/', InboxView.as_view(), name='inbox'),
 ]
\ No newline at end of file
@@ -1,37 +1,77 @@
+from django.db import transaction
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Message
-from .serializers import MessageSerializer
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.exceptions import ValidationError
+from users.roles import resolve_role
+from .models import Message, Conversation
+from .serializers import MessageSerializer, message_rows
+from mental_health_clinic.renderers import FastJSONRenderer
+from .realtime import push_new_message, push_read_receipt
+from .inbox import therapist_inbox, patient_inbox
 
 User = get_user_model()
 
 
 class ChatThreadView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    # Page size for thread reads (?limit= may lower or raise it up to the max)
+    page_size = 50
+    max_page_size = 200
 
     def get(self, request, other_user_id):
         """
-        Fetch the entire chat history between the logged-in user and 'other_user_id'.
+        Fetch one bounded page of the chat history between the logged-in user and 'other_user_id'.
+
+        - no cursor:       the latest page, oldest first (initial load)
+        - ?after_id=<id>:  messages newer than <id>, oldest first (catch-up sync)
+        - ?before_id=<id>: messages older than <id>, newest first (scroll-back)
         """
+        after_id = self._int_param(request, 'after_id')
+        before_id = self._int_param(request, 'before_id')
+        limit = min(self._int_param(request, 'limit') or self.page_size, self.max_page_size)
+
         # We use Q objects to get messages where YOU are the sender OR YOU are the receiver
-        messages = Message.objects.filter(
+        thread = Message.objects.filter(
             Q(sender=request.user, receiver_id=other_user_id) |
             Q(sender_id=other_user_id, receiver=request.user)
-        ).order_by('timestamp')  # Sort chronologically
+        )
+
+        # Ids grow with time, so they double as a stable, gap-free cursor
+        if after_id is not None:
+            page = thread.filter(id__gt=after_id).order_by('id')[:limit]
+        elif before_id is not None:
+            page = thread.filter(id__lt=before_id).order_by('-id')[:limit]
+        else:
+            # Newest page first from the database, flipped to reading order below
+            page = thread.order_by('-id')[:limit]
 
         # Mark all unread messages FROM the other user as read (since we're viewing them now)
-        Message.objects.filter(
-            sender_id=other_user_id,
-            receiver=request.user,
-            is_read=False
-        ).update(is_read=True)
+        with transaction.atomic():
+            marked = Message.objects.filter(
+                sender_id=other_user_id,
+                receiver=request.user,
+                is_read=False
+            ).update(is_read=True)
+            if marked:
+                Conversation.mark_read(reader_id=request.user.id, other_user_id=other_user_id, count=marked)
 
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        # Let the sender's open sockets show the read receipt
+        if marked:
+            push_read_receipt(reader_id=request.user.id, other_user_id=other_user_id)
+
+        # Only the columns MessageSerializer renders, names from the same JOIN,
+        # built as plain dicts (see message_rows)
+        messages = message_rows(page)
+        if after_id is None and before_id is None:
+            messages.reverse()
+        return Response(messages)
 
     def post(self, request, other_user_id):
         """
@@ -46,7 +86,43 @@ class ChatThreadView(APIView):
                 return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
             # Securely save the message. We manually inject the sender and receiver!
-            serializer.save(sender=request.user, receiver=receiver)
+            # The inbox counters move in the same transaction as the message.
+            with transaction.atomic():
+                message = serializer.save(sender=request.user, receiver=receiver)
+                Conversation.record_message(message)
+            push_new_message(dict(serializer.data), sender_id=request.user.id, receiver_id=receiver.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def _int_param(request, name):
+        value = request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValidationError({name: "Must be an integer."})
+        if number < 0:
+            raise ValidationError({name: "Must not be negative."})
+        return number
+
+
+class InboxView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Conversation list for the logged-in therapist or patient: each contact with
+        the latest message snippet, its time and the unread count, most recent first.
+        """
+        role = resolve_role(request)
+
+        if role.is_therapist:
+            return Response(therapist_inbox(request, role.therapist))
+
+        if role.is_patient:
+            return Response(patient_inbox(request, role.patient))
+
+        return Response({"error": "Only therapists and patients have an inbox."}, status=status.HTTP_403_FORBIDDEN)
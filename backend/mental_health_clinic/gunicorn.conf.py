@@ -0,0 +1,63 @@
+"""
+Gunicorn settings for production: `gunicorn -c gunicorn.conf.py`.
+
+Two modes, picked with GUNICORN_MODE:
+
+* wsgi (default) - the REST API on threaded sync workers. Django keeps one
+  database connection per thread, so CONN_MAX_AGE reuses them across requests.
+* asgi - the same project through uvicorn workers, for the WebSocket chat.
+  Run it as a separate service with DB_POOL=True (or DB_CONN_MAX_AGE=0):
+  under ASGI each request gets its own thread, so persistent per-thread
+  connections would pile up.
+
+Every number can be overridden from the environment.
+"""
+import multiprocessing
+import os
+import shutil
+
+cpus = multiprocessing.cpu_count()
+mode = os.getenv("GUNICORN_MODE", "wsgi")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+if mode == "asgi":
+    wsgi_app = "mental_health_clinic.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    # One event loop per core; sockets mostly sit idle waiting for pushes
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus))
+else:
+    wsgi_app = "mental_health_clinic.wsgi:application"
+    worker_class = "gthread"
+    # The usual (2 x cores) + 1 processes, each with a few threads to overlap
+    # time spent waiting on Postgres
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# Workers write their request metrics to files in one shared directory, so
+# /metrics can merge every process (see mental_health_clinic/metrics.py).
+# Set before the workers fork and import prometheus_client.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-metrics")
+
+
+def on_starting(server):
+    # Files from a previous run would be counted again
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,6 +2,8 @@
 ASGI config for mental_health_clinic project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django as usual; WebSocket connections are routed to
+the chat consumers in ``communications.routing``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +15,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mental_health_clinic.settings')
 
-application = get_asgi_application()
+# Initialise Django before importing anything that touches the ORM
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from communications.middleware import JWTAuthMiddleware  # noqa: E402
+from communications.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    ),
+})
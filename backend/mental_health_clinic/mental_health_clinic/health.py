@@ -0,0 +1,60 @@
+import time
+
+from django.db import DatabaseError, connection
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+def database_pool_stats():
+    """
+    Utilisation of this process's connection pool, or None when pooling is off
+    (DB_POOL in settings). Each gunicorn worker has its own pool.
+    """
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+
+    stats = pool.get_stats()
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    in_use = size - available
+    return {
+        'min_size': stats.get('pool_min', pool.min_size),
+        'max_size': stats.get('pool_max', pool.max_size),
+        'size': size,
+        'in_use': in_use,
+        'available': available,
+        'waiting': stats.get('requests_waiting', 0),
+        'utilization': round(in_use / pool.max_size, 3) if pool.max_size else 0,
+        # Cumulative counters since the pool opened
+        'requests': stats.get('requests_num', 0),
+        'timeouts': stats.get('requests_errors', 0),
+        'connections_opened': stats.get('connections_num', 0),
+    }
+
+
+class HealthView(APIView):
+    """
+    GET /api/health/ - liveness for load balancers plus database status.
+    Returns 503 when the database can't be reached.
+    """
+    authentication_classes = []  # No token, no user lookup
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            database = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+        except DatabaseError as error:
+            database = {'ok': False, 'error': error.__class__.__name__}
+
+        body = {
+            'status': 'ok' if database['ok'] else 'unavailable',
+            'database': database,
+            'pool': database_pool_stats(),
+        }
+        return Response(body, status=status.HTTP_200_OK if database['ok'] else status.HTTP_503_SERVICE_UNAVAILABLE)
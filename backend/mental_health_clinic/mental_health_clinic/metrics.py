@@ -0,0 +1,62 @@
+"""
+Request metrics, rendered in the Prometheus text format at /metrics.
+
+Built on prometheus_client. Under gunicorn each worker is its own process
+and a scrape reaches whichever worker accepts it, so per-process numbers
+would jump between unrelated values from one scrape to the next. With
+PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py does this) every worker
+writes its samples to files in that directory and /metrics merges them,
+giving one consistent set of counters for the whole server. Without it
+(runserver, tests) the numbers are this process's own.
+"""
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+ENDPOINT_LABELS = ('method', 'route')
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling the request.', ENDPOINT_LABELS,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter('http_requests_total', 'Requests handled, by response status.', ENDPOINT_LABELS + ('status',))
+SQL_QUERIES = Histogram(
+    'http_request_sql_queries', 'SQL queries run per request.', ENDPOINT_LABELS,
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+SQL_TIME = Histogram(
+    'http_request_sql_duration_seconds', 'Total time spent in SQL per request.', ENDPOINT_LABELS,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size.', ENDPOINT_LABELS,
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+N_PLUS_ONE = Counter(
+    'http_request_repeated_queries_total',
+    'Requests where one query shape ran often enough to look like an N+1.',
+    ENDPOINT_LABELS,
+)
+
+
+def render():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Fresh registry per scrape: the collector reads every worker's files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics_view(request):
+    """
+    GET /metrics. If METRICS_TOKEN is set, scrapers must send it as a Bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE_LATEST)
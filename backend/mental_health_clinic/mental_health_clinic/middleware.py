@@ -1,3 +1,16 @@
+import logging
+import re
+import time
+from collections import Counter as ShapeCounter
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
 class RemoveServerHeaderMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -7,4 +20,83 @@ class RemoveServerHeaderMiddleware:
         # Remove the 'Server' header if it exists to hide version info
         if response.has_header('Server'):
             del response['Server']
-        return response
\ No newline at end of file
+        return response
+
+
+# "IN (%s, %s, %s)" and "IN (%s)" are the same query shape
+_PLACEHOLDER_RUN = re.compile(r'%s(?:\s*,\s*%s)+')
+# Router regexes, e.g. "^appointments/(?P<pk>[^/.]+)/$" -> "appointments/<pk>/"
+_ROUTE_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+class QueryTracker:
+    """execute_wrapper that counts and times every query a request runs."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = ShapeCounter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[_PLACEHOLDER_RUN.sub('%s', sql)] += 1
+
+    def repeated(self, threshold):
+        """Query shapes that ran at least `threshold` times (likely N+1)."""
+        return [(shape, count) for shape, count in self.shapes.items() if count >= threshold]
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, status, SQL query count/time and response size per
+    endpoint (mental_health_clinic/metrics.py), adds a Server-Timing header
+    and logs query shapes repeated N_PLUS_ONE_THRESHOLD times or more.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        if request.path == '/metrics':
+            return self.get_response(request)
+
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # Label by URL pattern, not the raw path, so ids don't explode the series
+        match = getattr(request, 'resolver_match', None)
+        if match:
+            route = '/' + _ROUTE_GROUP.sub(r'<\1>', match.route).replace('^', '').replace('$', '')
+        else:
+            route = 'unmatched'
+        labels = (request.method, route)
+
+        metrics.REQUEST_LATENCY.labels(*labels).observe(elapsed)
+        metrics.REQUESTS.labels(*labels, response.status_code).inc()
+        metrics.SQL_QUERIES.labels(*labels).observe(tracker.count)
+        metrics.SQL_TIME.labels(*labels).observe(tracker.duration)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.labels(*labels).observe(len(response.content))
+
+        repeated = tracker.repeated(self.threshold)
+        if repeated:
+            metrics.N_PLUS_ONE.labels(*labels).inc()
+            shape, count = max(repeated, key=lambda item: item[1])
+            logger.warning("Possible N+1 on %s %s: query ran %d times: %s", request.method, route, count, shape[:300])
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={tracker.duration * 1000:.1f};desc="{tracker.count} queries"'
+            )
+        return response
@@ -0,0 +1,220 @@
+"""
+Sparse fieldsets shared by the app serializers.
+
+GET ?fields=id,start_time,therapist_details.user.last_name keeps only the
+named fields (dotted names reach into nested serializers).
+GET ?expand=service_details keeps only the listed Meta.expandable_fields
+(the nested objects) and drops the rest; naming one in ?fields also counts.
+Without either param the response is unchanged.
+
+shape_queryset() then reads the serializer's final field tree, so the
+query joins only the relations that get rendered and, for a restricted
+response, loads only the columns they need. values_plan()/values_rows()
+go one step further for list endpoints: when every rendered field maps to
+a column, rows are built from values_list() without model instances or
+per-field serializer calls.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def parse_field_tree(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _restrict(serializer, tree):
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    for name in list(serializer.fields):
+        if name not in tree:
+            serializer.fields.pop(name)
+        elif tree[name] and isinstance(serializer.fields[name], BaseSerializer):
+            _restrict(serializer.fields[name], tree[name])
+
+
+class DynamicFieldsMixin:
+    """Applies ?fields= / ?expand= to the top-level serializer of a GET."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.restricted = False
+        # The parsed ?fields= tree, for extras added in to_representation()
+        self.requested_fields = None
+
+        # Nested copies are built without a request; only the outermost reacts
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        params = request.query_params
+
+        tree = parse_field_tree(params['fields']) if 'fields' in params else None
+        if tree:
+            _restrict(self, tree)
+            self.restricted = True
+            self.requested_fields = tree
+
+        if 'expand' in params:
+            wanted = set(parse_field_tree(params['expand'])) | set(tree or ())
+            for name in getattr(self.Meta, 'expandable_fields', ()):
+                if name not in wanted:
+                    self.fields.pop(name, None)
+            self.restricted = True
+
+
+def _all_columns(model, prefix):
+    return {prefix + field.name for field in model._meta.concrete_fields}
+
+
+def _walk(serializer, model, prefix, related, columns):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, ListSerializer):
+            continue  # To-many: not joined
+        if field.source == '*':
+            # Method fields may read anything on the row
+            columns |= _all_columns(model, prefix)
+            continue
+
+        current, path = model, prefix
+        parts = field.source.split('.')
+        for part in parts[:-1]:
+            try:
+                relation = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                columns |= _all_columns(current, path)
+                break
+            related.add(path + part)
+            columns.add(path + part)
+            current, path = relation.related_model, f'{path}{part}__'
+        else:
+            last = parts[-1]
+            try:
+                model_field = current._meta.get_field(last)
+            except FieldDoesNotExist:
+                # A property or method (e.g. user.get_full_name)
+                columns |= _all_columns(current, path)
+                continue
+
+            if isinstance(field, BaseSerializer):
+                related.add(path + last)
+                if model_field.concrete:
+                    columns.add(path + last)
+                _walk(field, model_field.related_model, f'{path}{last}__', related, columns)
+            elif model_field.concrete:
+                columns.add(path + last)
+            else:
+                columns |= _all_columns(current, path)
+
+
+def shape_queryset(queryset, serializer, extra_columns=()):
+    """
+    select_related() for every nested object the serializer renders, plus
+    only() on the rendered columns when ?fields= / ?expand= trimmed it.
+    `extra_columns` are loaded regardless (e.g. what pagination reads).
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    related, columns = set(), set()
+    _walk(serializer, queryset.model, '', related, columns)
+
+    if getattr(serializer, 'restricted', False):
+        # Replaces any joins the view set up for the full representation
+        queryset = queryset.select_related(None).only(*sorted(columns | set(extra_columns)))
+    return queryset.select_related(*sorted(related)) if related else queryset
+
+
+# Fields whose to_representation() leaves a column value unchanged
+_PASSTHROUGH = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ChoiceField, serializers.PrimaryKeyRelatedField,
+)
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _plan_node(serializer, model, prefix, lookups):
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        raise _Unsupported
+    entries = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, ListSerializer) or field.source == '*' or isinstance(field, serializers.FileField):
+            raise _Unsupported
+
+        current, path = model, prefix
+        parts = field.source.split('.')
+        for position, part in enumerate(parts, 1):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise _Unsupported  # Properties and methods need the instance
+            if isinstance(field, BaseSerializer) or position < len(parts):
+                if not model_field.is_relation or model_field.many_to_many or model_field.one_to_many:
+                    raise _Unsupported
+                path, current = f'{path}{part}__', model_field.related_model
+            else:
+                path += part
+
+        if isinstance(field, BaseSerializer):
+            # A missing related row renders as null, like DRF does
+            lookups.append(f'{path}{current._meta.pk.name}')
+            present = len(lookups) - 1
+            entries.append((name, None, (present, _plan_node(field, current, path, lookups))))
+        else:
+            if model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+                raise _Unsupported
+            lookups.append(path)
+            convert = None if isinstance(field, _PASSTHROUGH) else field.to_representation
+            entries.append((name, (len(lookups) - 1, convert), None))
+    return entries
+
+
+def values_plan(serializer):
+    """
+    (lookups, plan) to build the serializer's output straight from
+    values_list() rows, or None when some rendered field needs a model
+    instance (method fields, properties, files, custom to_representation).
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    lookups = []
+    try:
+        plan = _plan_node(serializer, serializer.Meta.model, '', lookups)
+    except _Unsupported:
+        return None
+    return lookups, plan
+
+
+def _build(row, plan):
+    item = {}
+    for name, column, nested in plan:
+        if nested is None:
+            index, convert = column
+            value = row[index]
+            item[name] = value if convert is None or value is None else convert(value)
+        else:
+            present, subplan = nested
+            item[name] = _build(row, subplan) if row[present] is not None else None
+    return item
+
+
+def build_rows(rows, plan):
+    """values_rows() for rows already fetched as values_list(*lookups, ...)."""
+    return [_build(row, plan) for row in rows]
+
+
+def values_rows(queryset, lookups, plan):
+    """Plain dicts equal to serializer(queryset, many=True).data, in one query."""
+    return build_rows(queryset.values_list(*lookups), plan)
@@ -27,6 +27,7 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver, so WebSockets work in development too
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -37,14 +38,18 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework',
     'drf_yasg',
+    'channels',
     'users',
     'appointments',
     'communications',
 ]
 
 MIDDLEWARE = [
+    'mental_health_clinic.structured_logging.RequestIdMiddleware', # X-Request-ID on every log line
     'mental_health_clinic.middleware.RemoveServerHeaderMiddleware', # Remove Server Header
+    'mental_health_clinic.middleware.RequestMetricsMiddleware', # Latency/SQL metrics, Server-Timing
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware', # Static files without a separate server
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +77,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mental_health_clinic.wsgi.application'
+ASGI_APPLICATION = 'mental_health_clinic.asgi.application'
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 
@@ -88,9 +94,37 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests instead of reconnecting every
+        # time; health checks drop ones the server has closed. The ASGI
+        # (WebSocket) service needs DB_POOL or DB_CONN_MAX_AGE=0 - see gunicorn.conf.py.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Connection pooling (pick at most one):
+#
+# DB_POOL=True - psycopg's built-in pool, one per gunicorn worker process.
+#   Threads borrow a ready connection per request and hand it back, which
+#   also suits the ASGI service. Each process holds up to DB_POOL_MAX_SIZE
+#   connections (default: one per worker thread), so keep
+#   workers x DB_POOL_MAX_SIZE under Postgres' max_connections (100 by default).
+#
+# DB_PGBOUNCER=True - connect through PgBouncer in transaction mode (point
+#   DB_HOST/DB_PORT at it). Server-side cursors don't survive transaction
+#   pooling, so they are turned off.
+if os.getenv("DB_POOL") == "True":
+    _db_threads = int(os.getenv("GUNICORN_THREADS", 4))
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # The pool keeps connections instead
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        'max_size': int(os.getenv("DB_POOL_MAX_SIZE", _db_threads)),
+        'timeout': float(os.getenv("DB_POOL_TIMEOUT", 10)),  # Seconds to wait for a free connection
+    }
+elif os.getenv("DB_PGBOUNCER") == "True":
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -128,6 +162,17 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # Filled by collectstatic in the Docker image
+
+# WhiteNoise serves the admin/Swagger assets pre-compressed with long cache headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedStaticFilesStorage',
+    },
+}
 AUTH_USER_MODEL = 'users.User'
 
 #CORs Configuration
@@ -143,18 +188,104 @@ if _extra_origins:
 # Django Rest Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication, plus profiles and role in the same query
+        'users.authentication.ProfileJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
 }
 
+# Channels (WebSocket chat)
+# The in-memory layer only reaches sockets in the same process, which is fine
+# for tests and a single worker. Set REDIS_URL when running several workers
+# (docker-compose.prod.yml does).
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Cache (master data responses in appointments/caching.py)
+# Local memory is per process: with several workers a change is only seen
+# by the others once their entries expire. REDIS_URL shares one cache.
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Adds role and profile-id claims (used by the stateless read mode below)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.ClinicTokenObtainPairSerializer',
+    # Refreshes re-read those claims, so role changes apply from the next refresh
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.ClinicTokenRefreshSerializer',
+}
+
+# Stateless reads: GETs on views using users.authentication.ClaimsJWTAuthentication
+# trust the token claims instead of loading the user. Deactivated accounts are
+# refused through the cache, so with several workers this needs REDIS_URL.
+JWT_STATELESS_READS = os.getenv("JWT_STATELESS_READS") == "True"
+
+# Request metrics (mental_health_clinic/metrics.py), scraped from /metrics.
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>" on scrapes.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "True") == "True"
+# Log a possible N+1 when one query shape repeats this often in a request
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+# Logging: JSON lines on stdout, written from a background thread
+# (mental_health_clinic/structured_logging.py). LOG_DEBUG_SAMPLE_RATE keeps
+# that fraction of DEBUG records when LOG_LEVEL=DEBUG.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'mental_health_clinic.structured_logging.RequestIdFilter'},
+        'sample_debug': {
+            '()': 'mental_health_clinic.structured_logging.SamplingFilter',
+            'rate': float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1")),
+        },
+    },
+    'formatters': {
+        'json': {'()': 'mental_health_clinic.structured_logging.JSONFormatter'},
+    },
+    'handlers': {
+        'json': {
+            'class': 'mental_health_clinic.structured_logging.BackgroundStreamHandler',
+            'formatter': 'json',
+            'filters': ['request_id', 'sample_debug'],
+        },
+    },
+    'root': {'handlers': ['json'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Replaces Django's DEBUG-only console handler, so no duplicate lines
+        'django': {'handlers': ['json'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 # Security settings
@@ -0,0 +1,124 @@
+"""
+JSON logging, wired up through settings.LOGGING.
+
+Every record gets the id of the request it was logged from (taken from an
+incoming X-Request-ID, e.g. set by nginx, or generated), DEBUG records can
+be sampled, and the actual write to stdout happens on a background thread
+so a slow log pipe never holds up a request.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+_request_id = ContextVar('request_id', default=None)
+
+_VALID_REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+# (django.request's `request` object is left out: the message already names the path)
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'request'}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Binds a request id for the duration of the request and echoes it back."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.headers.get('X-Request-ID', '')
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        request.request_id = request_id
+        token = _request_id.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        # django.request logs 4xx/5xx after the middleware has returned, but passes the request
+        request = getattr(record, 'request', None)
+        record.request_id = getattr(request, 'request_id', None) or _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a `rate` fraction of records at or below `level`."""
+
+    def __init__(self, rate=1.0, level='DEBUG'):
+        super().__init__()
+        self.rate = float(rate)
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record):
+        if record.levelno > self.level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields at the top level."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundStreamHandler(QueueHandler):
+    """
+    Formats on the calling thread (cheap, and the request id is still bound)
+    and queues the line for a listener thread that writes it to stdout.
+    If the queue is full the record is dropped rather than waited on.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self._stop_listener)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _stop_listener(self):
+        # Flushes whatever is still queued; safe to call more than once
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self._stop_listener()
+        super().close()
@@ -0,0 +1,131 @@
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from prometheus_client.values import MultiProcessValue
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import health, structured_logging
+from .metrics import render
+from .middleware import QueryTracker
+from .renderers import FastJSONRenderer
+
+
+class HealthViewTests(TestCase):
+
+    def test_reports_database_ok_without_pool(self):
+        response = APIClient().get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['database']['ok'])
+        self.assertIsNone(response.data['pool'])
+
+    def test_pool_utilization(self):
+        pool = mock.Mock(min_size=1, max_size=4)
+        pool.get_stats.return_value = {'pool_min': 1, 'pool_max': 4, 'pool_size': 3, 'pool_available': 1}
+        with mock.patch.object(health, 'connection', mock.Mock(pool=pool)):
+            stats = health.database_pool_stats()
+        self.assertEqual(stats['in_use'], 2)
+        self.assertEqual(stats['utilization'], 0.5)
+
+
+class RequestMetricsTests(TestCase):
+
+    def test_server_timing_header(self):
+        response = APIClient().get('/api/health/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+
+    def test_metrics_are_labelled_by_route(self):
+        client = APIClient()
+        client.get('/api/health/')
+        body = client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{method="GET",route="/api/health/",status="200"}', body)
+        self.assertIn('http_request_sql_queries_bucket{le="1.0",method="GET",route="/api/health/"}', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/health/"}', body)
+
+    def test_router_patterns_are_tidied(self):
+        client = APIClient()
+        client.get('/api/services/1/')
+        body = client.get('/metrics').content.decode()
+        self.assertIn('route="/api/services/<pk>/"', body)
+
+    def test_repeated_query_shapes_are_flagged(self):
+        tracker = QueryTracker()
+        execute = lambda sql, params, many, context: None
+        for ids in ([1], [1, 2], [1, 2, 3]):
+            tracker(execute, 'SELECT * FROM t WHERE id IN (%s)' % ', '.join(['%s'] * len(ids)), ids, False, {})
+        tracker(execute, 'SELECT 1', [], False, {})
+        self.assertEqual(tracker.count, 4)
+        self.assertEqual(tracker.repeated(3), [('SELECT * FROM t WHERE id IN (%s)', 3)])
+
+    def test_scrape_merges_every_worker(self):
+        # What two gunicorn workers leave in PROMETHEUS_MULTIPROC_DIR
+        labels = ('method', 'route', 'status'), ('GET', '/api/health/', '200')
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            for pid in (101, 102):
+                value_class = MultiProcessValue(process_identifier=lambda: pid)
+                value_class('counter', 'http_requests_total', 'http_requests_total', *labels, 'help').inc(3)
+            body = render().decode()
+        self.assertIn('http_requests_total{method="GET",route="/api/health/",status="200"} 6.0', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scrape_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(client.get('/metrics').status_code, 200)
+
+
+class StructuredLoggingTests(TestCase):
+
+    def record(self, level=logging.INFO, **extra):
+        record = logging.makeLogRecord({'name': 'clinic', 'levelno': level, 'levelname': logging.getLevelName(level), 'msg': 'hello %s', 'args': ('there',)})
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_lines_carry_request_id_and_extras(self):
+        line = json.loads(structured_logging.JSONFormatter().format(self.record(request_id='abc', scope='admin')))
+        self.assertEqual(line['message'], 'hello there')
+        self.assertEqual(line['request_id'], 'abc')
+        self.assertEqual(line['scope'], 'admin')
+
+    def test_request_id_is_echoed_or_generated(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/health/', HTTP_X_REQUEST_ID='edge-123')['X-Request-ID'], 'edge-123')
+        generated = client.get('/api/health/', HTTP_X_REQUEST_ID='bad id\n')['X-Request-ID']
+        self.assertRegex(generated, r'^[0-9a-f]{32}$')
+
+    def test_debug_sampling(self):
+        sampler = structured_logging.SamplingFilter(rate=0)
+        self.assertFalse(sampler.filter(self.record(logging.DEBUG)))
+        self.assertTrue(sampler.filter(self.record(logging.WARNING)))
+
+    def test_background_handler_drops_instead_of_blocking(self):
+        stream = io.StringIO()
+        handler = structured_logging.BackgroundStreamHandler(maxsize=1, stream=stream)
+        handler.listener.stop()  # Nothing drains the queue now
+        handler.handle(self.record())
+        handler.handle(self.record())
+        self.assertEqual(handler.dropped, 1)
+        handler.close()
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_matches_the_stock_renderer(self):
+        data = {'price': Decimal('12.50'), 'when': datetime(2030, 1, 2, 3, 4, tzinfo=dt_timezone.utc),
+                'label': gettext_lazy('Hello'), 'rows': [{'id': 1, 'ok': True}], 3: 'non-string key'}
+        fast = FastJSONRenderer().render(data)
+        stock = JSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(stock))
+
+    def test_indent_uses_the_stock_path(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
@@ -11,6 +11,9 @@ from rest_framework_simplejwt.views import (
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .health import HealthView
+from .metrics import metrics_view
+
 # --- 1. Swagger/Documentation Configuration ---
 schema_view = get_schema_view(
    openapi.Info(
@@ -35,6 +38,10 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
+    # --- Health (load balancers, pool utilisation) ---
+    path('api/health/', HealthView.as_view(), name='health'),
+    path('metrics', metrics_view, name='metrics'),
+
     # --- App Endpoints ---
     path('api/users/', include('users.urls')),
     path('api/', include('appointments.urls')),
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .roles import ResolvedRole
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user together with both profiles in one
+    query, and puts a ResolvedRole on the request so views don't have to
+    probe patient_profile / therapist_profile again.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            request.resolved_role = ResolvedRole(result[0])
+        return result
+
+    def get_user(self, validated_token):
+        # Same checks as JWTAuthentication.get_user, with select_related added
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = self.user_model.objects.select_related('patient_profile', 'therapist_profile').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+# --- Stateless reads ---
+
+class ClaimsUser(TokenUser):
+    """
+    A user rebuilt from the access token's claims (see
+    ClinicTokenObtainPairSerializer) instead of a database row.
+    """
+
+    @property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+    @property
+    def role(self):
+        return self.token.get('role', '')
+
+    @property
+    def patient_id(self):
+        return self.token.get('patient_id')
+
+    @property
+    def therapist_id(self):
+        return self.token.get('therapist_id')
+
+
+def _revoked_key(user_id):
+    return f'jwt:revoked:{user_id}'
+
+
+def revoke_user(user_id):
+    """
+    Refuses this user's outstanding access tokens on stateless reads.
+    Only needs to outlive the access token lifetime.
+    """
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    cache.set(_revoked_key(user_id), True, timeout)
+
+
+def restore_user(user_id):
+    cache.delete(_revoked_key(user_id))
+
+
+class ClaimsJWTAuthentication(ProfileJWTAuthentication):
+    """
+    For views that opt in (authentication_classes = [ClaimsJWTAuthentication]):
+    when settings.JWT_STATELESS_READS is on, GET/HEAD/OPTIONS requests are
+    authorized from the token's claims with no user query. Only a cache read
+    checks that the account hasn't been deactivated since the token was issued.
+    Writes, and tokens issued before the claims existed, use the database.
+    """
+
+    def authenticate(self, request):
+        self.stateless = getattr(settings, 'JWT_STATELESS_READS', False) and request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not (self.stateless and 'role' in validated_token):
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = ClaimsUser(validated_token)
+        if not user.is_active or cache.get(_revoked_key(user.id)):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,63 @@
+from django.db.models import Q
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class ProfileFilter(BaseFilterBackend):
+    """
+    Server-side filters for the profile tables.
+
+    ?name= matches every word against first/last name, username or email.
+    Each param in the view's `filter_params` ({param: lookup}) filters on
+    that lookup; repeat it to match any of several values
+    (?status=Active&status=Locked).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get('name', '')
+        for word in name.split():
+            queryset = queryset.filter(
+                Q(user__first_name__icontains=word) | Q(user__last_name__icontains=word)
+                | Q(user__username__icontains=word) | Q(user__email__icontains=word)
+            )
+
+        for param, lookup in getattr(view, 'filter_params', {}).items():
+            values = request.query_params.getlist(param)
+            if not values:
+                continue
+            if lookup.endswith('_id'):
+                try:
+                    values = [int(value) for value in values]
+                except ValueError:
+                    raise ValidationError({param: "Must be an integer id."})
+            queryset = queryset.filter(**{f'{lookup}__in': values})
+        return queryset
+
+
+class ProfileOrdering(BaseFilterBackend):
+    """
+    ?ordering= picks one of the view's named `ordering_options`; a leading
+    '-' reverses it. Unknown names fall back to `default_ordering`. The
+    primary key always breaks ties, so pages never overlap.
+    """
+
+    def get_ordering_name(self, request, view):
+        requested = request.query_params.get('ordering', '')
+        if requested.lstrip('-') in getattr(view, 'ordering_options', {}):
+            return requested
+        return getattr(view, 'default_ordering', 'id')
+
+    def filter_queryset(self, request, queryset, view):
+        name = self.get_ordering_name(request, view)
+        options = getattr(view, 'ordering_options', {})
+        fields = options.get(name.lstrip('-'), (name.lstrip('-'),))
+
+        if name.startswith('-'):
+            fields = [
+                field.copy().reverse_ordering() if isinstance(field, OrderBy)
+                else field[1:] if field.startswith('-') else f'-{field}'
+                for field in fields
+            ]
+            return queryset.order_by(*fields, '-id')
+        return queryset.order_by(*fields, 'id')
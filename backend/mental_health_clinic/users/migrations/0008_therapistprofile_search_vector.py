@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 15:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Same document as users.search.refresh_search_vector, for existing rows
+BACKFILL_SQL = """
+UPDATE users_therapistprofile AS profile
+SET search_vector =
+    setweight(to_tsvector('english', trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, ''))), 'A')
+    || setweight(to_tsvector('english', coalesce(profile.specialization, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(profile.bio, '')), 'B')
+FROM users_user AS u
+WHERE u.id = profile.user_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_therapistprofile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='therapistprofile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='therapistprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='therapist_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='therapistprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['focus_areas'], name='therapist_focus_areas_gin'),
+        ),
+    ]
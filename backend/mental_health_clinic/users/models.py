@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class User(AbstractUser):
@@ -41,6 +43,15 @@ class TherapistProfile(models.Model):
         help_text="e.g. ['Anxiety', 'Depression', 'Stress & burnout']"
     )
 
+    # Name, specialization and bio for the directory search (users/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='therapist_search_gin'),
+            GinIndex(fields=['focus_areas'], name='therapist_focus_areas_gin'),
+        ]
+
     def __str__(self):
         return f"Dr. {self.user.last_name} ({self.specialization})"
 
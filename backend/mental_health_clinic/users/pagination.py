@@ -0,0 +1,46 @@
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class ProfilePageNumberPagination(PageNumberPagination):
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class ProfileCursorPagination(CursorPagination):
+    """Keyset walk by id: no COUNT, no OFFSET, steady cost on deep pages."""
+    ordering = 'id'
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class ProfilePagination(BasePagination):
+    """
+    Opt-in pagination for the profile tables.
+
+    ?page= / ?page_size= give numbered pages with a total count (admin
+    tables). ?pagination=cursor, or following a ?cursor= link, gives
+    cursor pages ordered by id (infinite scroll, exports) and ignores
+    ?ordering=. Without any of these the response stays a plain list,
+    so existing callers keep working.
+    """
+
+    def __init__(self):
+        self.paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if params.get('pagination') == 'cursor' or 'cursor' in params:
+            self.paginator = ProfileCursorPagination()
+        elif 'page' in params or 'page_size' in params:
+            self.paginator = ProfilePageNumberPagination()
+        else:
+            return None
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return ProfilePageNumberPagination().get_paginated_response_schema(schema)
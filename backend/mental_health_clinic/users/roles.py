@@ -0,0 +1,72 @@
+from functools import cached_property
+
+from rest_framework_simplejwt.models import TokenUser
+
+from .models import PatientProfile, TherapistProfile
+
+
+class ResolvedRole:
+    """
+    Who the logged-in user is, worked out once per request.
+
+    Reads the profiles already attached to request.user (ProfileJWTAuthentication
+    loads them in the same query as the user), so checking the role never
+    costs another query. For users loaded some other way each profile is
+    looked up at most once, on first use. Token-claims users carry the
+    profile ids, so only code that needs the full profile row queries it.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+        self.is_admin = self.is_authenticated and user.is_superuser
+        self.from_claims = isinstance(user, TokenUser)
+
+    @cached_property
+    def patient(self):
+        if not self.is_authenticated:
+            return None
+        if self.from_claims:
+            return PatientProfile.objects.filter(pk=self.user.patient_id).first() if self.user.patient_id else None
+        # Reverse one-to-one misses raise RelatedObjectDoesNotExist (an AttributeError)
+        return getattr(self.user, 'patient_profile', None)
+
+    @cached_property
+    def therapist(self):
+        if not self.is_authenticated:
+            return None
+        if self.from_claims:
+            return TherapistProfile.objects.filter(pk=self.user.therapist_id).first() if self.user.therapist_id else None
+        return getattr(self.user, 'therapist_profile', None)
+
+    @property
+    def patient_id(self):
+        if self.from_claims:
+            return self.user.patient_id
+        return self.patient.pk if self.patient else None
+
+    @property
+    def therapist_id(self):
+        if self.from_claims:
+            return self.user.therapist_id
+        return self.therapist.pk if self.therapist else None
+
+    @property
+    def is_patient(self):
+        return self.patient_id is not None
+
+    @property
+    def is_therapist(self):
+        return self.therapist_id is not None
+
+
+def resolve_role(request):
+    """
+    The request's ResolvedRole, built on first use. Requests authenticated
+    some other way (sessions, force_authenticate in tests) get one too.
+    """
+    role = getattr(request, 'resolved_role', None)
+    if role is None or role.user is not request.user:
+        role = ResolvedRole(request.user)
+        request.resolved_role = role
+    return role
@@ -0,0 +1,92 @@
+"""
+Therapist directory search.
+
+Free text runs against TherapistProfile.search_vector, a stored tsvector
+(name and specialization weighted A, bio B) kept up to date by the signals
+in signals.py and GIN-indexed, as is focus_areas. Facet counts are
+disjunctive: each facet is counted with every *other* active filter
+applied, so picking "Anxiety" still shows how many match "Depression".
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import CharField, Count, F, Func, Q, TextField, Value
+
+from .models import TherapistProfile
+
+SEARCH_CONFIG = 'english'
+FACETS = ('focus_areas', 'gender', 'status')
+MAX_RESULTS = 50
+
+
+def refresh_search_vector(user):
+    """Rebuilds the search document of the user's therapist profile, if any."""
+    full_name = f"{user.first_name} {user.last_name}".strip()
+    TherapistProfile.objects.filter(user_id=user.pk).update(
+        search_vector=(
+            SearchVector(Value(full_name, output_field=TextField()), weight='A', config=SEARCH_CONFIG)
+            + SearchVector('specialization', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('bio', weight='B', config=SEARCH_CONFIG)
+        )
+    )
+
+
+class Unnest(Func):
+    """unnest(array): one row per element, so array values can be grouped."""
+    function = 'UNNEST'
+    output_field = CharField()
+
+
+def _filter(filters, skip=None):
+    """Q for the picked facet values, leaving out the `skip` facet."""
+    condition = Q()
+    for facet, wanted in filters.items():
+        if facet == skip or not wanted:
+            continue
+        if facet == 'focus_areas':
+            condition &= Q(focus_areas__overlap=sorted(wanted))
+        else:
+            condition &= Q(**{f'{facet}__in': sorted(wanted)})
+    return condition
+
+
+def count_facets(matching, filters):
+    """
+    {facet: [{'value', 'count'}, ...]} over the `matching` queryset, most
+    common first. One grouped query per facet, filtered in SQL.
+    """
+    facets = {}
+    for facet in FACETS:
+        scoped = matching.filter(_filter(filters, skip=facet))
+        if facet == 'focus_areas':
+            # A therapist listing an area twice still counts once
+            rows = scoped.values(value=Unnest('focus_areas')).annotate(count=Count('id', distinct=True))
+        else:
+            rows = scoped.exclude(**{f'{facet}__isnull': True}).exclude(**{facet: ''})
+            rows = rows.values(value=F(facet)).annotate(count=Count('id'))
+        facets[facet] = list(rows.order_by('-count', 'value'))
+    return facets
+
+
+def search_therapists(text='', filters=None):
+    """
+    Returns (count, top results, facets). `filters` maps each facet name to
+    the values picked; focus_areas matches therapists with any of them.
+    Every count is computed in SQL: one COUNT, one grouped query per facet
+    and one query for the page, so nothing scales with the directory size
+    in Python.
+    """
+    filters = {facet: set(filters.get(facet) or ()) for facet in FACETS} if filters else {}
+    matching = TherapistProfile.objects.all()
+    if text:
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        matching = matching.filter(search_vector=query)
+
+    results = matching.filter(_filter(filters))
+    count = results.count()
+
+    results = results.select_related('user')
+    if text:
+        results = results.annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank', 'id')
+    else:
+        results = results.order_by('user__last_name', 'user__first_name', 'id')
+
+    return count, list(results[:MAX_RESULTS]), count_facets(matching, filters)
@@ -1,6 +1,13 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from datetime import datetime
+
 from django.db import transaction
+from django.utils import timezone
 from .models import User, PatientProfile, TherapistProfile
+from mental_health_clinic.serializers import DynamicFieldsMixin
 
 
 # ==========================================
@@ -24,7 +31,7 @@ class UserSerializer(serializers.ModelSerializer):
             return 'patient'
 
 
-class PatientProfileSerializer(serializers.ModelSerializer):
+class PatientProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     # Accept nested user writes via separate fields
@@ -34,6 +41,7 @@ class PatientProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = PatientProfile
         fields = ['id', 'user', 'date_of_birth', 'medical_history', 'plan', 'therapist', 'status', 'gender', 'address', 'profile_image', 'first_name', 'last_name']
+        expandable_fields = ['user']
 
     def update(self, instance, validated_data):
         # 1. Extract and apply user-level fields
@@ -60,7 +68,7 @@ class PatientProfileSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class TherapistProfileSerializer(serializers.ModelSerializer):
+class TherapistProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     # Accept nested user writes via separate fields
@@ -71,6 +79,19 @@ class TherapistProfileSerializer(serializers.ModelSerializer):
         model = TherapistProfile
         fields = ['id', 'user', 'license_number', 'specialization', 'bio', 'profile_image', 'status', 'gender',
                   'focus_areas', 'first_name', 'last_name']
+        expandable_fields = ['user']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Only present when the list was asked for ?ordering=next_available,
+        # and left out when ?fields= doesn't name it
+        wanted = self.requested_fields is None or 'next_available' in self.requested_fields
+        if wanted and hasattr(instance, 'next_available_date'):
+            next_date, next_time = instance.next_available_date, instance.next_available_time
+            data['next_available'] = (
+                timezone.make_aware(datetime.combine(next_date, next_time)).isoformat() if next_date else None
+            )
+        return data
 
     def update(self, instance, validated_data):
         # 1. Extract and apply user-level fields
@@ -96,6 +117,54 @@ class TherapistProfileSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+# ==========================================
+# LOGIN (JWT) SERIALIZER
+# ==========================================
+
+def add_role_claims(token, user):
+    patient = getattr(user, 'patient_profile', None)
+    therapist = getattr(user, 'therapist_profile', None)
+
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token['is_active'] = user.is_active
+    token['patient_id'] = patient.pk if patient else None
+    token['therapist_id'] = therapist.pk if therapist else None
+    return token
+
+
+class ClinicTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Puts the role and profile ids into the tokens, so read-only endpoints can
+    authorize from the claims without loading the user (ClaimsJWTAuthentication).
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_role_claims(super().get_token(user), user)
+
+
+class ClinicTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-reads the role claims from the database on every refresh. The stock
+    serializer copies them from the refresh token, so a demoted user would
+    keep their old role for the whole refresh lifetime.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.select_related('patient_profile', 'therapist_profile').filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        add_role_claims(refresh, user)
+        return super().validate({**attrs, 'refresh': str(refresh)})
+
+
 # ==========================================
 # REGISTRATION SERIALIZER
 # ==========================================
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import restore_user, revoke_user
+from .models import TherapistProfile, User
+from .search import refresh_search_vector
+
+# Fields that feed TherapistProfile.search_vector
+NAME_FIELDS = {'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def sync_token_revocation(sender, instance, **kwargs):
+    # Covers the status-driven is_active toggles in the profile serializers
+    # as well as edits made in the admin
+    if instance.is_active:
+        restore_user(instance.pk)
+    else:
+        revoke_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_therapist_name(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login only; don't rewrite the search index for those
+    if update_fields is None or NAME_FIELDS & set(update_fields):
+        refresh_search_vector(instance)
+
+
+@receiver(post_save, sender=TherapistProfile)
+def reindex_therapist(sender, instance, **kwargs):
+    refresh_search_vector(instance.user)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    revoke_user(instance.pk)
@@ -1,3 +1,320 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from appointments.models import Appointment, Availability, Service
+from .models import User, PatientProfile, TherapistProfile
+from .serializers import TherapistProfileSerializer
+
+
+class ProfileJWTAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        TherapistProfile.objects.create(user=cls.therapist_user, license_number='LIC-1', specialization='CBT')
+
+        cls.patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        PatientProfile.objects.create(user=cls.patient_user, date_of_birth=date(1990, 1, 1))
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_me_costs_one_query_for_either_role(self):
+        for user, flag in ((self.therapist_user, 'is_therapist'), (self.patient_user, 'is_patient')):
+            client = self.client_for(user)
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get('/api/users/me/')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data[flag])
+            self.assertEqual(len(ctx.captured_queries), 1, [q['sql'] for q in ctx.captured_queries])
+
+    def test_role_checks_reuse_the_loaded_profile(self):
+        client = self.client_for(self.patient_user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/users/patients-list/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+@override_settings(JWT_STATELESS_READS=True)
+class StatelessReadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=cls.therapist_user, license_number='LIC-1', specialization='CBT')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        response = self.client.post('/api/token/', {'username': 'doc', 'password': 'pass12345'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def user_queries(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if '"users_user"' in q['sql']]
+
+    def test_token_carries_role_claims(self):
+        response = self.client.post('/api/token/', {'username': 'doc', 'password': 'pass12345'}, format='json')
+        token = AccessToken(response.data['access'])
+        self.assertEqual(token['role'], 'THERAPIST')
+        self.assertEqual(token['therapist_id'], self.therapist.pk)
+        self.assertIsNone(token['patient_id'])
+
+    def test_reads_skip_the_user_lookup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/availability/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user_queries(ctx), [])
+
+    def test_writes_still_load_the_user(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/availability/', {'date': '2030-03-04', 'start_time': '09:00', 'end_time': '10:00'}, format='json')
+        self.assertEqual(len(self.user_queries(ctx)), 1)
+
+    def test_deactivated_account_is_refused(self):
+        serializer = TherapistProfileSerializer(self.therapist, data={'status': 'On Leave'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        response = self.client.get('/api/availability/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_reloads_role_claims(self):
+        response = self.client.post('/api/token/', {'username': 'doc', 'password': 'pass12345'}, format='json')
+        refresh = response.data['refresh']
+        User.objects.filter(pk=self.therapist_user.pk).update(is_staff=False, role='PATIENT')
+
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        token = AccessToken(response.data['access'])
+        self.assertEqual(token['role'], 'PATIENT')
+        self.assertFalse(token['is_staff'])
+
+    def test_refresh_is_refused_for_a_deleted_user(self):
+        response = self.client.post('/api/token/', {'username': 'doc', 'password': 'pass12345'}, format='json')
+        refresh = response.data['refresh']
+        self.therapist_user.delete()
+
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_STATELESS_READS=False)
+    def test_mode_can_be_switched_off(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/availability/')
+        self.assertEqual(len(self.user_queries(ctx)), 1)
+
+
+class TherapistSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def therapist(username, first, last, specialization, bio, gender, focus_areas, status='Active'):
+            user = User.objects.create_user(username=username, password='pass12345', first_name=first, last_name=last, is_staff=True, role='THERAPIST')
+            return TherapistProfile.objects.create(
+                user=user, license_number=f'LIC-{username}', specialization=specialization, bio=bio,
+                gender=gender, focus_areas=focus_areas, status=status,
+            )
+
+        cls.ada = therapist('ada', 'Ada', 'Stone', 'CBT', 'Panic and worry', 'Female therapist', ['Anxiety', 'Stress'])
+        cls.ben = therapist('ben', 'Ben', 'Reed', 'Trauma', 'EMDR for veterans', 'Male therapist', ['Trauma', 'Anxiety'])
+        cls.cy = therapist('cy', 'Cy', 'Moss', 'Child Psychology', 'Play therapy', 'Non-binary', ['Depression'], status='On Leave')
+
+        cls.patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient_user)
+
+    @skipUnless(connection.vendor == 'postgresql', "Facet counts unnest arrays in PostgreSQL")
+    def test_facets_count_each_option(self):
+        response = self.client.get('/api/users/therapists/search/')
+        self.assertEqual(response.data['count'], 3)
+        areas = {item['value']: item['count'] for item in response.data['facets']['focus_areas']}
+        self.assertEqual(areas, {'Anxiety': 2, 'Stress': 1, 'Trauma': 1, 'Depression': 1})
+
+    @skipUnless(connection.vendor == 'postgresql', "Facet counts unnest arrays in PostgreSQL")
+    def test_facet_filters_are_disjunctive(self):
+        response = self.client.get('/api/users/therapists/search/', {'gender': 'Male therapist'})
+        self.assertEqual([t['id'] for t in response.data['results']], [self.ben.id])
+        self.assertEqual(response.data['count'], 1)
+        # The gender facet ignores its own selection, the others respect it
+        self.assertEqual(len(response.data['facets']['gender']), 3)
+        self.assertEqual({item['value'] for item in response.data['facets']['focus_areas']}, {'Trauma', 'Anxiety'})
+        self.assertEqual(response.data['facets']['status'], [{'value': 'Active', 'count': 1}])
+
+    @skipUnless(connection.vendor == 'postgresql', "Facet counts unnest arrays in PostgreSQL")
+    def test_counts_are_grouped_in_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/users/therapists/search/', {'focus_areas': 'Anxiety', 'status': 'Active'})
+        # COUNT, one GROUP BY per facet, then the page
+        self.assertEqual(len(ctx.captured_queries), 5)
+        self.assertEqual(sum('GROUP BY' in q['sql'] for q in ctx.captured_queries), 3)
+
+    def test_requires_login(self):
+        self.assertEqual(APIClient().get('/api/users/therapists/search/').status_code, 401)
+
+    @skipUnless(connection.vendor == 'postgresql', "Full-text search needs PostgreSQL")
+    def test_text_and_focus_area_search(self):
+        response = self.client.get('/api/users/therapists/search/', {'q': 'stone'})
+        self.assertEqual([t['id'] for t in response.data['results']], [self.ada.id])
+
+        response = self.client.get('/api/users/therapists/search/', {'q': 'veterans', 'focus_areas': 'Anxiety'})
+        self.assertEqual([t['id'] for t in response.data['results']], [self.ben.id])
+
+    @skipUnless(connection.vendor == 'postgresql', "Full-text search needs PostgreSQL")
+    def test_renaming_the_user_reindexes(self):
+        self.ada.user.last_name = 'Quartz'
+        self.ada.user.save()
+        response = self.client.get('/api/users/therapists/search/', {'q': 'quartz'})
+        self.assertEqual([t['id'] for t in response.data['results']], [self.ada.id])
+
+
+class NextAvailableOrderingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def therapist(username):
+            user = User.objects.create_user(username=username, password='pass12345', is_staff=True, role='THERAPIST')
+            return TherapistProfile.objects.create(user=user, license_number=f'LIC-{username}', specialization='CBT')
+
+        cls.early, cls.late, cls.booked, cls.idle = (therapist(name) for name in ('early', 'late', 'booked', 'idle'))
+        patient_user = User.objects.create_user(username='pat', password='pass12345', role='PATIENT')
+        cls.patient = PatientProfile.objects.create(user=patient_user, date_of_birth=date(1990, 1, 1))
+        cls.patient_user = patient_user
+
+        soon = timezone.localdate() + timedelta(days=2)
+        later = soon + timedelta(days=3)
+        Availability.objects.create(therapist=cls.early, date=soon, start_time=time(9), end_time=time(10))
+        Availability.objects.create(therapist=cls.late, date=later, start_time=time(9), end_time=time(10))
+        # Its earliest window is taken, so the next one counts
+        Availability.objects.create(therapist=cls.booked, date=soon, start_time=time(8), end_time=time(9))
+        Availability.objects.create(therapist=cls.booked, date=later, start_time=time(14), end_time=time(15))
+        service = Service.objects.create(name='Session', duration_minutes=60, price=50)
+        Appointment.objects.create(
+            patient=cls.patient, therapist=cls.booked, service=service,
+            start_time=timezone.make_aware(datetime.combine(soon, time(8))),
+        )
+        # Past windows never count
+        Availability.objects.create(therapist=cls.idle, date=soon - timedelta(days=7), start_time=time(9), end_time=time(10))
+
+    @skipUnless(connection.vendor == 'postgresql', "Window bounds use AT TIME ZONE in PostgreSQL")
+    def test_soonest_first_and_unavailable_last(self):
+        client = APIClient()
+        client.force_authenticate(self.patient_user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/users/therapists/', {'ordering': 'next_available'})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([t['id'] for t in response.data], [self.early.id, self.late.id, self.booked.id, self.idle.id])
+        self.assertIsNone(response.data[-1]['next_available'])
+        self.assertEqual(response.data[2]['next_available'][11:16], '14:00')
+
+    @skipUnless(connection.vendor == 'postgresql', "Window bounds use AT TIME ZONE in PostgreSQL")
+    def test_partly_booked_window_counts_from_the_first_free_moment(self):
+        day = timezone.localdate() + timedelta(days=1)
+        Availability.objects.create(therapist=self.idle, date=day, start_time=time(9), end_time=time(17))
+        service = Service.objects.get()
+        for hour in (9, 10):
+            Appointment.objects.create(
+                patient=self.patient, therapist=self.idle, service=service,
+                start_time=timezone.make_aware(datetime.combine(day, time(hour))),
+            )
+
+        client = APIClient()
+        client.force_authenticate(self.patient_user)
+        response = client.get('/api/users/therapists/', {'ordering': 'next_available'})
+        self.assertEqual(response.data[0]['id'], self.idle.id)
+        self.assertEqual(response.data[0]['next_available'][:16], f'{day.isoformat()}T11:00')
+
+    @skipUnless(connection.vendor == 'postgresql', "Window bounds use AT TIME ZONE in PostgreSQL")
+    def test_sparse_fields_decide_on_next_available(self):
+        client = APIClient()
+        client.force_authenticate(self.patient_user)
+        response = client.get('/api/users/therapists/', {'ordering': 'next_available', 'fields': 'id'})
+        self.assertEqual(set(response.data[0]), {'id'})
+
+        response = client.get('/api/users/therapists/', {'ordering': 'next_available', 'fields': 'id,next_available'})
+        self.assertEqual(set(response.data[0]), {'id', 'next_available'})
+
+    def test_field_only_present_when_ordering(self):
+        response = APIClient().get('/api/users/therapists/')
+        self.assertNotIn('next_available', response.data[0])
+
+
+class ProfileListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='pass12345', is_staff=True, is_superuser=True)
+        therapist_user = User.objects.create_user(username='doc', password='pass12345', is_staff=True, role='THERAPIST')
+        cls.therapist = TherapistProfile.objects.create(user=therapist_user, license_number='LIC-1', specialization='CBT')
+
+        cls.patients = []
+        for i, (first, last, plan) in enumerate([('Ann', 'Zed', 'Premium'), ('Bob', 'Young', 'Standard Plan'),
+                                                 ('Cat', 'Xu', 'Standard Plan'), ('Dan', 'West', 'Premium'),
+                                                 ('Eve', 'Vale', 'Standard Plan')]):
+            user = User.objects.create_user(username=f'p{i}', password='pass12345', first_name=first, last_name=last, role='PATIENT')
+            cls.patients.append(PatientProfile.objects.create(
+                user=user, date_of_birth=date(1990, 1, 1), plan=plan,
+                therapist=cls.therapist if plan == 'Premium' else None,
+            ))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url, params=None, queries=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        if queries is not None:
+            self.assertEqual(len(ctx.captured_queries), queries, [q['sql'] for q in ctx.captured_queries])
+        return response
+
+    def test_list_and_retrieve_join_the_user(self):
+        response = self.get('/api/users/patients/', queries=1)
+        self.assertEqual(len(response.data), 5)
+        self.get(f'/api/users/patients/{self.patients[0].pk}/', queries=1)
+        self.get('/api/users/therapists/', queries=1)
+
+    def test_sparse_fields_skip_the_user_join(self):
+        response = self.get('/api/users/patients/', {'fields': 'id,plan'}, queries=1)
+        self.assertEqual(response.data[0], {'id': self.patients[0].pk, 'plan': 'Premium'})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/users/therapists/', {'expand': ''})
+        self.assertNotIn('users_user', ctx.captured_queries[0]['sql'])
+
+    def test_page_numbers(self):
+        response = self.get('/api/users/patients/', {'page_size': 2, 'ordering': 'name'}, queries=2)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([p['user']['last_name'] for p in response.data['results']], ['Vale', 'West'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_cursor_pages_walk_everything_once(self):
+        seen = []
+        response = self.get('/api/users/patients/', {'pagination': 'cursor', 'page_size': 2}, queries=1)
+        while True:
+            seen += [p['id'] for p in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.get(response.data['next'])
+        self.assertEqual(seen, sorted(p.pk for p in self.patients))
+
+    def test_filters(self):
+        response = self.get('/api/users/patients/', {'plan': 'Premium', 'ordering': '-name'})
+        self.assertEqual([p['user']['first_name'] for p in response.data], ['Ann', 'Dan'])
+
+        response = self.get('/api/users/patients/', {'therapist': self.therapist.pk, 'name': 'dan'})
+        self.assertEqual([p['id'] for p in response.data], [self.patients[3].pk])
+
+        self.assertEqual(self.client.get('/api/users/patients/', {'therapist': 'abc'}).status_code, 400)
@@ -1,4 +1,6 @@
+from django.db.models import F
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
@@ -6,14 +8,74 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 
 from .models import PatientProfile, TherapistProfile
 from .serializers import PatientProfileSerializer, TherapistProfileSerializer, RegistrationSerializer
+from .roles import resolve_role
+from .search import FACETS, search_therapists
+from .filters import ProfileFilter, ProfileOrdering
+from .pagination import ProfilePagination
+from appointments.scheduling import annotate_next_available
+from mental_health_clinic.serializers import shape_queryset
+
+# Sort keys shared by both profile tables (see filters.ProfileOrdering)
+NAME_ORDERING = ('user__last_name', 'user__first_name')
+
 
 class PatientProfileViewSet(viewsets.ModelViewSet):
-    queryset = PatientProfile.objects.all()
+    # The nested UserSerializer reads the user: join it on every action
+    # (get_queryset leaves it out when the response doesn't render it)
+    queryset = PatientProfile.objects.select_related('user')
     serializer_class = PatientProfileSerializer
+    # ?name=, ?status=, ?plan=, ?therapist=, ?ordering=; ?page= or ?pagination=cursor
+    filter_backends = [ProfileFilter, ProfileOrdering]
+    pagination_class = ProfilePagination
+    filter_params = {'status': 'status', 'plan': 'plan', 'therapist': 'therapist_id'}
+    ordering_options = {
+        'name': NAME_ORDERING,
+        'status': ('status',),
+        'plan': ('plan',),
+        'joined': ('user__date_joined',),
+    }
+
+    def get_queryset(self):
+        # Drops the user join and unread columns for ?fields= / ?expand=
+        return shape_queryset(super().get_queryset(), self.get_serializer())
 
 class TherapistProfileViewSet(viewsets.ModelViewSet):
-    queryset = TherapistProfile.objects.all()
+    queryset = TherapistProfile.objects.select_related('user')
     serializer_class = TherapistProfileSerializer
+    # ?name=, ?status=, ?gender=, ?ordering=; ?page= or ?pagination=cursor
+    filter_backends = [ProfileFilter, ProfileOrdering]
+    pagination_class = ProfilePagination
+    filter_params = {'status': 'status', 'gender': 'gender'}
+    ordering_options = {
+        'name': NAME_ORDERING,
+        'status': ('status',),
+        # Soonest open slot first, fully booked last
+        'next_available': (
+            F('next_available_date').asc(nulls_last=True),
+            F('next_available_time').asc(nulls_last=True),
+        ),
+    }
+
+    def get_queryset(self):
+        queryset = shape_queryset(super().get_queryset(), self.get_serializer())
+        if self.action == 'list' and self.request.query_params.get('ordering', '').lstrip('-') == 'next_available':
+            queryset = annotate_next_available(queryset)
+        return queryset
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def search(self, request):
+        """
+        Directory search: ?q= free text over name, specialization and bio,
+        plus repeatable ?focus_areas=, ?gender= and ?status= filters.
+        Returns the best matches with facet counts for the current filters.
+        """
+        filters = {facet: request.query_params.getlist(facet) for facet in FACETS}
+        count, therapists, facets = search_therapists(request.query_params.get('q', '').strip(), filters)
+        return Response({
+            'count': count,
+            'results': self.get_serializer(therapists, many=True).data,
+            'facets': facets,
+        })
 
 
 class CurrentUserView(APIView):
@@ -21,14 +83,15 @@ class CurrentUserView(APIView):
 
     def get(self, request):
         user = request.user
+        role = resolve_role(request)
         full_name = f"{user.first_name} {user.last_name}".strip() or user.username
-        is_therapist = hasattr(user, 'therapist_profile')
-        is_patient = hasattr(user, 'patient_profile') # Check for patient profile
+        is_therapist = role.is_therapist
+        is_patient = role.is_patient # Check for patient profile
         display_name = f"Dr. {full_name}" if is_therapist else full_name
 
         profile_data = {}
         if is_therapist:
-            profile = user.therapist_profile
+            profile = role.therapist
             image_url = request.build_absolute_uri(profile.profile_image.url) if profile.profile_image else None
             focus_string = ', '.join(profile.focus_areas) if profile.focus_areas else ''
 
@@ -44,7 +107,7 @@ class CurrentUserView(APIView):
             }
         elif is_patient:
             # --- NEW: ADD PATIENT DATA TO RESPONSE ---
-            profile = user.patient_profile
+            profile = role.patient
             image_url = request.build_absolute_uri(profile.profile_image.url) if profile.profile_image else None
             profile_data = {
                 'dob': profile.date_of_birth,
@@ -77,6 +140,7 @@ class CurrentUserView(APIView):
 
     def patch(self, request):
         user = request.user
+        role = resolve_role(request)
         data = request.data
 
         # 1. Update Core User Fields (Common for everyone)
@@ -87,8 +151,8 @@ class CurrentUserView(APIView):
         user.save()
 
         # 2. Update Role-Specific Profile Fields
-        if hasattr(user, 'therapist_profile'):
-            profile = user.therapist_profile
+        if role.is_therapist:
+            profile = role.therapist
             if 'specialty' in data: profile.specialization = data['specialty']
             if 'bio' in data: profile.bio = data['bio']
             if 'dob' in data: profile.date_of_birth = data['dob']
@@ -104,8 +168,8 @@ class CurrentUserView(APIView):
                 profile.profile_image = request.FILES['profile_image']
             profile.save()
 
-        elif hasattr(user, 'patient_profile'):
-            profile = user.patient_profile
+        elif role.is_patient:
+            profile = role.patient
 
             # These fields must exist in your PatientProfile model
             if 'dob' in data: profile.date_of_birth = data['dob']
@@ -172,41 +236,21 @@ class ChangePasswordView(APIView):
         return Response({"message": "Password updated successfully."}, status=status.HTTP_200_OK)
 
 
-from django.contrib.auth import get_user_model
-User = get_user_model()
+from communications.inbox import therapist_inbox, patient_inbox
 
 
 class PatientListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
+        role = resolve_role(request)
 
         # Security Check
-        if not hasattr(user, 'therapist_profile'):
+        if not role.is_therapist:
             return Response({"error": "Only therapists can view assigned patients."}, status=status.HTTP_403_FORBIDDEN)
 
-        # --- THE PATIENT FILTER ---
-        # Uses 'patient_profile__appointments' because your patient ForeignKey has related_name='appointments'
-        patients = User.objects.filter(
-            patient_profile__isnull=False,
-            patient_profile__appointments__therapist=user.therapist_profile
-        ).distinct()
-
-        contact_list = []
-        for patient in patients:
-            profile = patient.patient_profile
-            image_url = request.build_absolute_uri(profile.profile_image.url) if profile.profile_image else None
-
-            contact_list.append({
-                'id': patient.id,
-                'name': f"{patient.first_name} {patient.last_name}".strip() or patient.username,
-                'img': image_url,
-                'tag': 'Patient',
-                'lastMsg': 'Click to view conversation...',
-                'unread': 0,
-                'time': ''
-            })
+        # Latest message, time and unread count per patient, in one query
+        contact_list = therapist_inbox(request, role.therapist)
 
         return Response(contact_list, status=status.HTTP_200_OK)
 
@@ -215,32 +259,13 @@ class DoctorListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
+        role = resolve_role(request)
 
         # Security Check
-        if not hasattr(user, 'patient_profile'):
+        if not role.is_patient:
             return Response({"error": "Only patients can view assigned doctors."}, status=status.HTTP_403_FORBIDDEN)
 
-        # --- THE DOCTOR FILTER ---
-        # Uses 'therapist_profile__schedule' because your therapist ForeignKey has related_name='schedule'
-        doctors = User.objects.filter(
-            therapist_profile__isnull=False,
-            therapist_profile__schedule__patient=user.patient_profile
-        ).distinct()
+        # Latest message, time and unread count per doctor, in one query
+        contact_list = patient_inbox(request, role.patient)
 
-        contact_list = []
-        for doctor in doctors:
-            profile = doctor.therapist_profile
-            image_url = request.build_absolute_uri(profile.profile_image.url) if profile.profile_image else None
-
-            contact_list.append({
-                'id': doctor.id,
-                'name': f"Dr. {doctor.first_name} {doctor.last_name}".strip() or f"Dr. {doctor.username}",
-                'img': image_url,
-                'tag': profile.specialization or 'Therapist',
-                'lastMsg': 'Click to view conversation...',
-                'unread': 0,
-                'time': ''
-            })
-
-        return Response(contact_list, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(contact_list, status=status.HTTP_200_OK)